@@ -0,0 +1,333 @@
+import json
+import re
+from dataclasses import asdict, dataclass, field
+
+# --- PARSEO DEL REPORTE EN MARKDOWN (LEGADO) ---
+# Solo para escaneos guardados antes de la respuesta en JSON: una sección
+# existe apenas aparece su encabezado.
+
+# (clave, encabezado, encabezados que la cierran). El reporte puede traer
+# las habilidades del puntaje local antes del texto de la IA, por eso
+# RESUMEN también corta la sección de palabras clave.
+SECCIONES = [
+    ("palabras", "HABILIDADES DURAS", ["RESUMEN", "CHEQUEO ATS", "CONSEJOS"]),
+    ("formato", "CHEQUEO ATS", ["CONSEJOS", "RESUMEN"]),
+    ("consejos", "CONSEJOS", ["RESUMEN"]),
+]
+
+# Exige un no-dígito detrás del número para no leer "7" cuando aún falta el "8"
+_RE_SCORE = re.compile(r"SCORE\W*(\d+)(?=\D)")
+
+
+def extraer_score(texto, parcial=False):
+    # Con el texto completo un número al final también vale
+    m = _RE_SCORE.search((texto or "") + ("" if parcial else " "))
+    return min(int(m.group(1)), 100) if m else None
+
+
+def extraer_secciones(texto):
+    """Dict clave -> contenido, o None si el encabezado todavía no apareció"""
+    texto = texto or ""
+    secciones = {}
+    for clave, inicio, fines in SECCIONES:
+        i = texto.find(inicio)
+        if i == -1:
+            secciones[clave] = None
+            continue
+        i += len(inicio)
+        cortes = [j for j in (texto.find(fin, i) for fin in fines) if j != -1]
+        secciones[clave] = texto[i:min(cortes)] if cortes else texto[i:]
+    if secciones["palabras"] is not None:
+        secciones["palabras"] = secciones["palabras"].replace("4.", "").replace("5.", "").replace("6.", "")
+    return secciones
+
+
+# --- PROMPT DE ANÁLISIS ---
+# Subir la versión al cambiar el prompt invalida el cache de análisis.
+# Las habilidades y el score salen del puntaje local; la IA solo redacta
+# los campos cualitativos (y el score si el léxico no reconoció nada), en
+# JSON con esquema para no depender de partir el texto.
+VERSION_PROMPT = 4
+PROMPT_ANALISIS = """
+Analiza este CV contra esta Oferta como un experto ATS.
+Las habilidades ya se compararon automáticamente:
+- Presentes: {presentes}
+- Faltantes: {faltantes}
+Responde SOLO un objeto JSON con estos campos:
+{secciones}
+
+CV: {cv}
+OFERTA: {job}
+"""
+
+
+def construir_prompt_analisis(cv, job, local):
+    secciones = ["resumen: diagnóstico breve.",
+                 "chequeo_ats: lista de {aspecto, estado, detalle} evaluando formato, fechas e imágenes; "
+                 "estado es ok, mejorar o falta.",
+                 "consejos: lista con 3 tips de reclutador."]
+    if local['score'] is None: secciones.insert(0, "score: entero de 0 a 100.")
+    presentes = local['duras']['presentes'] + local['blandas']['presentes']
+    faltantes = local['duras']['faltantes'] + local['blandas']['faltantes']
+    return PROMPT_ANALISIS.format(
+        presentes=", ".join(presentes) or "ninguna", faltantes=", ".join(faltantes) or "ninguna",
+        secciones="\n".join(f"{i}. {sec}" for i, sec in enumerate(secciones, 1)), cv=cv, job=job)
+
+
+# --- ANÁLISIS ESTRUCTURADO ---
+# La IA responde JSON con esquema (modo JSON de Gemini) y se valida campo
+# por campo en dataclasses. Si algún campo no pasa, se le vuelve a pedir a
+# la IA solo ese campo. Render, PDF e historial leen esta estructura.
+
+ESTADOS_ATS = ("ok", "mejorar", "falta")
+ICONOS_ATS = {"ok": "✅", "mejorar": "⚠️", "falta": "❌"}
+MAX_REPARACIONES = 2
+
+
+@dataclass
+class Habilidades:
+    presentes: list = field(default_factory=list)
+    faltantes: list = field(default_factory=list)
+
+
+@dataclass
+class ChequeoATS:
+    aspecto: str
+    estado: str
+    detalle: str
+
+
+@dataclass
+class Analisis:
+    score: int = None
+    resumen: str = ""
+    duras: Habilidades = field(default_factory=Habilidades)
+    blandas: Habilidades = field(default_factory=Habilidades)
+    chequeo_ats: list = field(default_factory=list)  # [ChequeoATS]
+    consejos: list = field(default_factory=list)
+
+    def a_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def desde_dict(cls, datos):
+        return cls(score=datos.get("score"), resumen=datos.get("resumen") or "",
+                   duras=Habilidades(**datos.get("duras") or {}), blandas=Habilidades(**datos.get("blandas") or {}),
+                   chequeo_ats=[ChequeoATS(**c) for c in datos.get("chequeo_ats") or []],
+                   consejos=list(datos.get("consejos") or []))
+
+
+_ESQUEMA_CAMPOS = {
+    "score": {"type": "INTEGER"},
+    "resumen": {"type": "STRING"},
+    "chequeo_ats": {"type": "ARRAY", "items": {
+        "type": "OBJECT",
+        "properties": {"aspecto": {"type": "STRING"}, "estado": {"type": "STRING"}, "detalle": {"type": "STRING"}},
+        "required": ["aspecto", "estado", "detalle"]}},
+    "consejos": {"type": "ARRAY", "items": {"type": "STRING"}},
+}
+
+
+def campos_ia(con_score):
+    """Campos que redacta la IA; el score solo si el puntaje local no lo dio"""
+    return (["score"] if con_score else []) + ["resumen", "chequeo_ats", "consejos"]
+
+
+def esquema_respuesta(campos):
+    return {"type": "OBJECT", "properties": {c: _ESQUEMA_CAMPOS[c] for c in campos}, "required": list(campos)}
+
+
+def config_json(campos):
+    """generation_config para generate_content: JSON con el esquema de esos campos"""
+    return {"response_mime_type": "application/json", "response_schema": esquema_respuesta(campos)}
+
+
+# --- VALIDACIÓN ---
+# Cada validador devuelve el valor normalizado o lanza ValueError.
+def _validar_score(v):
+    if isinstance(v, str) and v.strip().isdigit(): v = int(v)
+    if isinstance(v, bool) or not isinstance(v, (int, float)): raise ValueError("score no numérico")
+    return max(0, min(100, int(v)))
+
+
+def _validar_resumen(v):
+    if not isinstance(v, str) or not v.strip(): raise ValueError("resumen vacío")
+    return v.strip()
+
+
+def _validar_chequeo(v):
+    if not isinstance(v, list) or not v: raise ValueError("chequeo_ats vacío")
+    chequeos = []
+    for c in v:
+        if not isinstance(c, dict) or not str(c.get("aspecto") or "").strip(): raise ValueError("chequeo sin aspecto")
+        estado = str(c.get("estado") or "").strip().lower()
+        chequeos.append(ChequeoATS(str(c["aspecto"]).strip(), estado if estado in ESTADOS_ATS else "mejorar",
+                                   str(c.get("detalle") or "").strip()))
+    return chequeos
+
+
+def _validar_consejos(v):
+    if not isinstance(v, list): raise ValueError("consejos no es lista")
+    consejos = [str(c).strip() for c in v if str(c).strip()]
+    if not consejos: raise ValueError("consejos vacío")
+    return consejos
+
+
+VALIDADORES = {"score": _validar_score, "resumen": _validar_resumen,
+               "chequeo_ats": _validar_chequeo, "consejos": _validar_consejos}
+
+
+def validar(datos, campos):
+    """({campo: valor válido}, [campos que fallaron])"""
+    validos, fallidos = {}, []
+    datos = datos if isinstance(datos, dict) else {}
+    for campo in campos:
+        try:
+            validos[campo] = VALIDADORES[campo](datos.get(campo))
+        except (ValueError, TypeError):
+            fallidos.append(campo)
+    return validos, fallidos
+
+
+# --- JSON PARCIAL ---
+def _quitar_cercas(texto):
+    texto = (texto or "").strip()
+    if texto.startswith("```"):
+        texto = texto.split("\n", 1)[1] if "\n" in texto else ""
+        if texto.rstrip().endswith("```"): texto = texto.rstrip()[:-3]
+    return texto.strip()
+
+
+def _cierre(texto):
+    """Lo que falta para cerrar strings, objetos y listas abiertos"""
+    pila, en_string, escape = [], False, False
+    for c in texto:
+        if en_string:
+            if escape: escape = False
+            elif c == "\\": escape = True
+            elif c == '"': en_string = False
+        elif c == '"': en_string = True
+        elif c in "{[": pila.append("}" if c == "{" else "]")
+        elif c in "}]":
+            if not pila: return None
+            pila.pop()
+    return ('"' if en_string else "") + "".join(reversed(pila))
+
+
+def parsear_json_parcial(texto):
+    """El JSON completo, o lo que se pueda rescatar de uno cortado (streaming); None si nada"""
+    texto = _quitar_cercas(texto)
+    try:
+        return json.loads(texto)
+    except ValueError:
+        pass
+    recorte = texto
+    while recorte:
+        cierre = _cierre(recorte)
+        if cierre is not None:
+            try:
+                return json.loads(recorte.rstrip().rstrip(",") + cierre)
+            except ValueError:
+                pass
+        # Se descarta el último valor incompleto y se prueba de nuevo
+        i = max(recorte.rfind(","), recorte.rfind("{"), recorte.rfind("["))
+        if i <= 0: return None
+        recorte = recorte[:i] if recorte[i] == "," else recorte[:i + 1]
+    return None
+
+
+# --- ARMADO ---
+def combinar(local, validos):
+    """Analisis con las habilidades/score locales y los campos de la IA que ya son válidos"""
+    score = local["score"] if local["score"] is not None else validos.get("score")
+    return Analisis(score=score, resumen=validos.get("resumen", ""),
+                    duras=Habilidades(**local["duras"]), blandas=Habilidades(**local["blandas"]),
+                    chequeo_ats=validos.get("chequeo_ats", []), consejos=validos.get("consejos", []))
+
+
+def parcial(texto, local):
+    """Analisis con lo que ya llegó por streaming"""
+    datos = parsear_json_parcial(texto)
+    return combinar(local, validar(datos, campos_ia(local["score"] is None))[0])
+
+
+PROMPT_REPARACION = """
+Tu respuesta anterior a la consulta de abajo no traía válidos estos campos: {campos}.
+Responde SOLO un objeto JSON con esos campos.
+
+CONSULTA ORIGINAL:
+{prompt}
+"""
+
+
+def completar(texto, local, prompt, generar):
+    """(Analisis, JSON de la IA ya validado, campos que siguen inválidos).
+
+    `generar(prompt, campos)` devuelve el texto de la IA; los campos inválidos se
+    vuelven a pedir solos hasta MAX_REPARACIONES veces. Sin `prompt` (respuesta
+    sacada del cache o del historial) no hay consulta que reparar."""
+    campos = campos_ia(local["score"] is None)
+    validos, fallidos = validar(parsear_json_parcial(texto), campos)
+    for _ in range(MAX_REPARACIONES if prompt else 0):
+        if not fallidos: break
+        try:
+            reparado = generar(PROMPT_REPARACION.format(campos=", ".join(fallidos), prompt=prompt), fallidos)
+        except Exception:
+            break  # Se sigue con lo que ya es válido
+        nuevos, fallidos = validar(parsear_json_parcial(reparado), fallidos)
+        validos.update(nuevos)
+    return combinar(local, validos), json.dumps(_serializar(validos), ensure_ascii=False), fallidos
+
+
+def _serializar(validos):
+    return {k: ([asdict(c) for c in v] if k == "chequeo_ats" else v) for k, v in validos.items()}
+
+
+def desde_rapido(local, resumen):
+    """Analisis del escaneo rápido: solo el puntaje local, sin IA"""
+    return combinar(local, {"resumen": resumen})
+
+
+def desde_markdown(texto):
+    """Escaneos viejos guardados como reporte en Markdown"""
+    secciones = extraer_secciones(texto)
+    consejos = [l.strip(" -*") for l in (secciones["consejos"] or "").splitlines() if l.strip(" -*")]
+    formato = (secciones["formato"] or "").strip()
+    # Las habilidades viejas no se separan en listas: quedan como texto en el resumen
+    return Analisis(score=extraer_score(texto), resumen=(secciones["palabras"] or texto).strip(),
+                    chequeo_ats=[ChequeoATS("Formato", "mejorar", formato)] if formato else [],
+                    consejos=consejos)
+
+
+# --- MARKDOWN PARA LA UI ---
+def markdown_habilidades(analisis):
+    def lista(items): return ", ".join(items) if items else "—"
+    lineas = []
+    for titulo, h in (("Habilidades duras", analisis.duras), ("Habilidades blandas", analisis.blandas)):
+        lineas += [f"#### {titulo}", f"- **Presentes:** {lista(h.presentes)}", f"- **Faltantes:** {lista(h.faltantes)}", ""]
+    return "\n".join(lineas)
+
+
+def markdown_chequeo(analisis):
+    return "\n".join(f"- {ICONOS_ATS.get(c.estado, '')} **{c.aspecto}:** {c.detalle}" for c in analisis.chequeo_ats)
+
+
+def markdown_consejos(analisis):
+    return "\n".join(f"{i}. {c}" for i, c in enumerate(analisis.consejos, 1))
+
+
+def a_markdown(analisis):
+    """Reporte completo en texto plano con encabezados ### (PDF e historial)"""
+    def lista(items): return ", ".join(items) if items else "-"
+    lineas = [f"SCORE: {analisis.score}"] if analisis.score is not None else []
+    if analisis.resumen: lineas += ["### RESUMEN", analisis.resumen]
+    lineas.append("### HABILIDADES")
+    for titulo, h in (("Duras", analisis.duras), ("Blandas", analisis.blandas)):
+        lineas += [f"{titulo} presentes: {lista(h.presentes)}", f"{titulo} faltantes: {lista(h.faltantes)}"]
+    if analisis.chequeo_ats:
+        lineas.append("### CHEQUEO ATS")
+        lineas += [f"- {c.aspecto} ({c.estado}): {c.detalle}" for c in analisis.chequeo_ats]
+    if analisis.consejos:
+        lineas.append("### CONSEJOS")
+        lineas += [f"{i}. {c}" for i, c in enumerate(analisis.consejos, 1)]
+    return "\n".join(lineas)
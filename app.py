@@ -1,18 +1,30 @@
+import time
+T_INICIO = time.perf_counter()  # Reporte de tiempos (sección 9)
 import streamlit as st
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
-import requests
-from bs4 import BeautifulSoup
-from pypdf import PdfReader
-from docx import Document
-from fpdf import FPDF
-from gtts import gTTS
-import io
 import re
-import sqlite3
-import hashlib
-import time
+import json
+import base64
+from base_datos import init_db, crear_usuario, verificar_login
+from cache_analisis import CacheAnalisis
+from documentos import extraer_texto
+from web import leer_web
+from analisis import (Analisis, VERSION_PROMPT, construir_prompt_analisis, campos_ia, config_json, completar, parcial, desde_rapido, desde_markdown,
+                      a_markdown, markdown_habilidades, markdown_chequeo, markdown_consejos)
+from despachador import DespachadorModelos
+from limitador import LimitadorTokens, ColaLlena
+from lote import escanear_lote, separar_ofertas, filas_a_csv, clave_lote
+from puntaje_local import puntuar, resumen_rapido, VERSION_LEXICO
+from compactacion import compactar
+from audio import CacheAudio, lanzar_entrevista, repetir_entrevista
+import historial
+import metricas
+from estilos import css_minificado
+from tiempos import RegistroTiempos
+from trabajos import ColaTrabajos, ESCANEO, LOTE
+# google.generativeai, pypdf, docx, bs4, gtts, fpdf y plotly se importan recién al usarse
+T_IMPORTACIONES = time.perf_counter() - T_INICIO
 
 # --- 1. CONFIGURACIÓN ---
 load_dotenv()
@@ -20,9 +32,10 @@ st.set_page_config(page_title="ScanMatch | ATS Resume Checker", layout="wide", p
 
 # --- 2. GESTIÓN DE ESTADO ---
 if 'analyzed' not in st.session_state: st.session_state['analyzed'] = False
-if 'analysis_result' not in st.session_state: st.session_state['analysis_result'] = None
+if 'analisis' not in st.session_state: st.session_state['analisis'] = None
 if 'pdf_data' not in st.session_state: st.session_state['pdf_data'] = None
-if 'audio_data' not in st.session_state: st.session_state['audio_data'] = None
+if 'entrevista' not in st.session_state: st.session_state['entrevista'] = None
+if 'trabajo' not in st.session_state: st.session_state['trabajo'] = None
 if 'score' not in st.session_state: st.session_state['score'] = 0
 if 'cv_content' not in st.session_state: st.session_state['cv_content'] = ""
 if 'job_content' not in st.session_state: st.session_state['job_content'] = ""
@@ -31,36 +44,63 @@ if 'username' not in st.session_state: st.session_state['username'] = ""
 if 'nombre_usuario' not in st.session_state: st.session_state['nombre_usuario'] = ""
 
 # --- 3. BASE DE DATOS ---
-def init_db():
-    conn = sqlite3.connect('usuarios.db')
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS users (username TEXT PRIMARY KEY, password TEXT, name TEXT, email TEXT)''')
-    conn.commit()
-    conn.close()
-
-def crear_usuario(username, password, name, email):
-    conn = sqlite3.connect('usuarios.db')
-    c = conn.cursor()
-    pwd_hash = hashlib.sha256(password.encode()).hexdigest()
+# Todo lo de esta sección corre una vez por proceso, no en cada rerun
+@st.cache_resource
+def inicializar_base():
+    init_db()
+    historial.init_historial()
+
+inicializar_base()
+
+@st.cache_resource
+def iniciar_metricas():
+    # /metrics en texto de Prometheus; sin SCANMATCH_METRICS_PORT no se abre nada
+    puerto = os.getenv("SCANMATCH_METRICS_PORT")
+    if not puerto: return None
     try:
-        c.execute('INSERT INTO users VALUES (?,?,?,?)', (username, pwd_hash, name, email))
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        return False
-    finally:
-        conn.close()
-
-def verificar_login(username, password):
-    conn = sqlite3.connect('usuarios.db')
-    c = conn.cursor()
-    pwd_hash = hashlib.sha256(password.encode()).hexdigest()
-    c.execute('SELECT * FROM users WHERE username = ? AND password = ?', (username, pwd_hash))
-    user = c.fetchone()
-    conn.close()
-    return user
-
-init_db()
+        return metricas.iniciar_servidor(int(puerto))
+    except OSError:  # Puerto ocupado (p.ej. otro proceso de la app)
+        return None
+
+iniciar_metricas()
+
+@st.cache_resource
+def obtener_registro_tiempos():
+    return RegistroTiempos()
+
+@st.cache_resource
+def obtener_cache_analisis():
+    return CacheAnalisis()
+
+cache_analisis = obtener_cache_analisis()
+
+@st.cache_resource
+def obtener_cache_audio():
+    return CacheAudio(os.getenv("SCANMATCH_DIR_AUDIO", "cache_audio"))
+
+cache_audio = obtener_cache_audio()
+
+@st.cache_resource
+def obtener_renderizador_pdf():
+    from reporte_pdf import RenderizadorPDF  # fpdf solo para quien exporta
+    return RenderizadorPDF()
+
+@st.cache_resource
+def obtener_plotly():
+    """plotly.graph_objects, o None si no está instalado (sin reintentar el import en cada rerun)"""
+    try:
+        import plotly.graph_objects as go
+        return go
+    except ImportError:
+        return None
+
+@st.cache_resource
+def configurar_api(api_key):
+    import google.generativeai as genai
+    # SCANMATCH_GEMINI_ENDPOINT (p.ej. un proxy o el servidor falso de benchmark.py) va por REST
+    endpoint = os.getenv("SCANMATCH_GEMINI_ENDPOINT")
+    if endpoint: genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": endpoint})
+    else: genai.configure(api_key=api_key)
 
 # --- 4. API & SIDEBAR ---
 with st.sidebar:
@@ -74,166 +114,438 @@ with st.sidebar:
         st.error("❌ Falta API Key")
         st.stop()
     
-    genai.configure(api_key=api_key)
+    configurar_api(api_key)
     
     if st.session_state['logged_in']:
         st.success(f"Usuario: {st.session_state['nombre_usuario']}")
+        st.radio("Modo", ["Individual", "Lote", "Historial", "Ofertas"], key='modo_app', horizontal=True)
         if st.button("Cerrar Sesión"):
             st.session_state['logged_in'] = False
             st.rerun()
     else:
         st.caption("Inicia sesión para usar la herramienta.")
 
+    stats = cache_analisis.stats()
+    st.caption(f"Cache: {stats['aciertos']} aciertos / {stats['fallos']} fallos")
+
+    st.toggle("Respuesta en streaming", value=True, key='modo_streaming')
+    st.toggle("Escaneo rápido (sin IA)", value=False, key='modo_rapido')
+
     st.divider()
     if st.button("🔄 Nueva Búsqueda (Reset)"):
-        keys_to_keep = ['logged_in', 'username', 'nombre_usuario']
+        keys_to_keep = ['logged_in', 'username', 'nombre_usuario', 'modo_streaming', 'modo_rapido', 'modo_app']
         for key in list(st.session_state.keys()):
             if key not in keys_to_keep:
                 del st.session_state[key]
         st.rerun()
 
 # --- 5. FUNCIONES CORE ---
-def generar_contenido_seguro(prompt):
-    modelos_a_probar = ["gemini-2.5-flash", "gemini-1.5-flash", "gemini-pro"]
-    errores = []
-    for nombre_modelo in modelos_a_probar:
-        try:
-            model = genai.GenerativeModel(nombre_modelo)
-            response = model.generate_content(prompt)
-            return response
-        except Exception as e:
-            if "429" in str(e): time.sleep(5)
-            errores.append(f"{nombre_modelo}: {str(e)}")
-            continue 
-    raise Exception(f"Error AI: {errores}")
-
-def limpiar_texto_audio(texto):
-    """Elimina markdown para que el audio suene natural"""
-    texto = re.sub(r'[\*#_`~]', '', texto) # Quita simbolos
-    texto = re.sub(r'^\s*-\s+', '', texto, flags=re.MULTILINE) # Quita guiones de lista
-    texto = texto.replace("Score:", "Puntaje:").replace("/", " de ")
-    return texto
+MODELOS = ["gemini-2.5-flash", "gemini-1.5-flash", "gemini-pro"]
+
+MODELO_EMBEDDINGS = os.getenv("SCANMATCH_MODELO_EMBEDDINGS", "models/text-embedding-004")
+
+# Presupuesto de tokens para cada documento dentro del prompt
+PRESUPUESTO_TOKENS_CV = int(os.getenv("SCANMATCH_TOKENS_CV", "4000"))
+PRESUPUESTO_TOKENS_OFERTA = int(os.getenv("SCANMATCH_TOKENS_OFERTA", "4000"))
+
+# Compartidos por todas las sesiones del proceso
+@st.cache_resource
+def obtener_limitador():
+    return LimitadorTokens(int(os.getenv("SCANMATCH_RPM", "60")))
+
+@st.cache_resource
+def obtener_despachador():
+    # SCANMATCH_HEDGE_SEGUNDOS activa el modo hedged (vacío = secuencial)
+    retraso = os.getenv("SCANMATCH_HEDGE_SEGUNDOS")
+    return DespachadorModelos(MODELOS, retraso_hedge=float(retraso) if retraso else None, limitador=obtener_limitador())
+
+despachador = obtener_despachador()
+
+def generar_contenido_seguro(prompt, **kwargs):
+    # Cada llamada toma un cupo del proceso: escaneos, paquetes de lote y entrevistas comparten el tope
+    with cola_trabajos.cupos_ia: return despachador.generar(prompt, **kwargs)
+
+def generar_contenido_stream(prompt, **kwargs):
+    """Como generar_contenido_seguro pero entrega el texto por fragmentos"""
+    with cola_trabajos.cupos_ia: yield from despachador.generar_stream(prompt, **kwargs)
+
+def reparar_campos(prompt, campos):
+    """Vuelve a pedir solo los campos del JSON que no pasaron la validación"""
+    return generar_contenido_seguro(prompt, generation_config=config_json(campos)).text
+
+def ejecutar_escaneo(entrada, avance):
+    """Escaneo con IA; corre en un hilo de la cola de trabajos, así que nada de st.* acá"""
+    cv, job, version, clave = entrada['cv'], entrada['job'], entrada['version'], entrada['clave']
+    local = puntuar(cv, job)
+    metricas.nueva_traza()
+    with metricas.tramo("escaneo", rapido=False):
+        texto, prompt = cache_analisis.obtener(clave), ""
+        if texto is None:
+            # CV editado contra una oferta ya escaneada: se reusa o solo se manda lo que cambió
+            base = historial.ultimo_para_oferta(entrada['username'], job, version)
+            plan, cambios, eliminadas = historial.planificar_reescaneo(base, cv)
+            if plan == 'reusar': texto = base['reporte_ia']
+        if texto is None:
+            with metricas.tramo("prompt", plan=plan):
+                job_prompt = compactar(job, PRESUPUESTO_TOKENS_OFERTA, despachador.contar_tokens)
+                if plan == 'incremental':
+                    prompt = historial.prompt_incremental(base, cambios, eliminadas, job_prompt)
+                else:
+                    cv_prompt = compactar(cv, PRESUPUESTO_TOKENS_CV, despachador.contar_tokens)
+                    prompt = construir_prompt_analisis(cv_prompt, job_prompt, local)
+            config = config_json(campos_ia(local['score'] is None))
+            if entrada['streaming']:
+                texto = ""
+                for fragmento in generar_contenido_stream(prompt, generation_config=config):
+                    texto += fragmento
+                    avance(texto)
+            else:
+                texto = generar_contenido_seguro(prompt, generation_config=config).text
+        # Solo los campos inválidos vuelven a la IA (y solo si hubo consulta nueva)
+        analisis, texto_ia, fallidos = completar(texto, local, prompt, reparar_campos)
+        if prompt and not fallidos: cache_analisis.guardar(clave, texto_ia)
+        if analisis.score is None: analisis.score = 50
+        id_escaneo = historial.guardar_escaneo(entrada['username'], cv, job, analisis.score,
+                                               analisis.a_dict(), a_markdown(analisis), texto_ia, version)
+    return {'id_escaneo': id_escaneo}
+
+def ejecutar_lote(entrada, avance):
+    """Lote en un hilo de la cola de trabajos; las filas van al parcial a medida que llegan"""
+    cvs = [(nombre, base64.b64decode(datos)) for nombre, datos in entrada['cvs']]
+    ofertas = [tuple(oferta) for oferta in entrada['ofertas']]
+    total, filas = len(cvs) * len(ofertas), []
+    # Los paquetes van en paralelo; cada llamada espera un cupo libre de cola_trabajos.cupos_ia
+    for fila in escanear_lote(cvs, ofertas, generar_contenido_seguro, cache=cache_analisis,
+                              modelos=",".join(MODELOS), max_concurrencia=cola_trabajos.hilos):
+        filas.append(fila)
+        filas.sort(key=lambda f: f['Score'] if f['Score'] is not None else -1, reverse=True)
+        avance(json.dumps({'filas': filas, 'total': total}, ensure_ascii=False))
+    return {'filas': filas}
+
+@st.cache_resource
+def obtener_cola_trabajos():
+    # Tope de llamadas a la IA a la vez por proceso, sin importar cuántas pestañas haya abiertas
+    return ColaTrabajos({ESCANEO: ejecutar_escaneo, LOTE: ejecutar_lote}, int(os.getenv("SCANMATCH_CONCURRENCIA", "4")),
+                        int(os.getenv("SCANMATCH_COLA_MAX", "50")))
+
+cola_trabajos = obtener_cola_trabajos()
+
+def embeber(textos):
+    """Vectores de una tanda de textos en una sola llamada"""
+    import google.generativeai as genai
+    obtener_limitador().adquirir()
+    return genai.embed_content(model=MODELO_EMBEDDINGS, content=textos, task_type="semantic_similarity")['embedding']
+
+@st.cache_resource
+def obtener_indice_ofertas():
+    from indice_ofertas import IndiceOfertas, DIR_INDICE  # numpy solo para quien ordena ofertas
+    return IndiceOfertas(embeber, MODELO_EMBEDDINGS, os.getenv("SCANMATCH_DIR_INDICE", DIR_INDICE))
+
+def dibujar_score(score):
+    """Gauge de Match Rate (con o sin plotly)"""
+    go = obtener_plotly()
+    if go is not None:
+        fig = go.Figure(go.Indicator(
+            mode = "gauge+number",
+            value = score,
+            domain = {'x': [0, 1], 'y': [0, 1]},
+            title = {'text': "Match Rate"},
+            gauge = {
+                'axis': {'range': [0, 100], 'tickwidth': 1, 'tickcolor': "darkblue"},
+                'bar': {'color': "#004F9F"},
+                'bgcolor': "white",
+                'borderwidth': 2,
+                'bordercolor': "gray",
+                'steps': [
+                    {'range': [0, 50], 'color': '#FFCCCC'},
+                    {'range': [50, 75], 'color': '#FFF4CC'},
+                    {'range': [75, 100], 'color': '#CCFFCC'}],
+                'threshold': {
+                    'line': {'color': "red", 'width': 4},
+                    'thickness': 0.75,
+                    'value': score}}))
+        fig.update_layout(height=300, margin=dict(l=20, r=20, t=30, b=20), paper_bgcolor="rgba(0,0,0,0)", font={'color': "black"})
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        # FALLBACK SI NO INSTALÓ PLOTLY
+        color = "#2ECC71" if score > 75 else ("#F1C40F" if score > 50 else "#E74C3C")
+        st.markdown(f"""
+        <div class="score-circle" style="border-color:{color};">
+            <span style="font-size:3.5rem; font-weight:800; color:#333;">{score}%</span>
+            <span style="font-size:1rem; color:#666; font-weight:600;">MATCH RATE</span>
+        </div>
+        <p style="text-align:center; color:#666;">(Instala 'plotly' para ver el gráfico Pro)</p>
+        """, unsafe_allow_html=True)
 
 # --- 6. ESTILOS CSS ---
-st.markdown("""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Open+Sans:wght@400;600;700;800&display=swap');
-    
-    /* ANIMACIÓN DE FONDO */
-    @keyframes gradient-animation {
-        0% { background-position: 0% 50%; }
-        50% { background-position: 100% 50%; }
-        100% { background-position: 0% 50%; }
-    }
-
-    .stApp {
-        background: linear-gradient(-45deg, #004F9F, #2563EB, #00d2ff, #F8C43A);
-        background-size: 400% 400%;
-        animation: gradient-animation 15s ease infinite;
-    }
-    
-    /* CAPA DE VIDRIO (TRANSPARENTE) */
-    .stApp::before {
-        content: ""; position: absolute; top: 0; left: 0; width: 100%; height: 100%;
-        background: rgba(255, 255, 255, 0.4); 
-        backdrop-filter: blur(12px);
-        z-index: -1;
-    }
-
-    html, body, [class*="css"] {
-        font-family: 'Open Sans', sans-serif;
-        color: #333;
-    }
-
-    /* NAVBAR */
-    .navbar {
-        background: rgba(255, 255, 255, 0.9);
-        padding: 15px 40px; border-bottom: 1px solid #ddd;
-        display: flex; justify-content: space-between; align-items: center; margin-bottom: 20px; border-radius: 8px;
-        backdrop-filter: blur(5px);
-    }
-    .brand { font-size: 24px; font-weight: 800; color: #004F9F; }
-    
-    /* CARDS */
-    .scanner-card {
-        background: rgba(255, 255, 255, 0.95);
-        border-radius: 8px; box-shadow: 0 8px 32px 0 rgba(31, 38, 135, 0.15);
-        padding: 30px; border: 1px solid rgba(255, 255, 255, 0.18); margin-bottom: 30px;
-        backdrop-filter: blur(4px);
-    }
-    .login-box {
-        max-width: 400px; margin: 50px auto; padding: 40px; 
-        background: rgba(255, 255, 255, 0.95);
-        border-radius: 12px; box-shadow: 0 8px 32px 0 rgba(31, 38, 135, 0.2); text-align: center;
-        border: 1px solid rgba(255, 255, 255, 0.18);
-    }
-    
-    /* BOTONES */
-    .stButton > button {
-        background-color: #F8C43A; color: #111; font-weight: 700; border: none;
-        padding: 12px 30px; font-size: 18px; width: 100%; text-transform: uppercase;
-        border-radius: 4px;
-        box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-    }
-    .stButton > button:hover { background-color: #E5B020; transform: translateY(-1px); box-shadow: 0 6px 8px rgba(0,0,0,0.15); }
-    
-    /* SCORE FALLBACK (CSS) */
-    .score-circle {
-        width: 180px; height: 180px; border-radius: 50%;
-        display: flex; flex-direction: column; justify-content: center; align-items: center;
-        margin: 0 auto; border: 10px solid #ddd; background: white;
-    }
-    .icon-box { font-size: 30px; margin-bottom: 10px; }
-</style>
-""", unsafe_allow_html=True)
-
-# --- 7. UTILIDADES PDF/WEB ---
-class PDFJobScan(FPDF):
-    def header(self):
-        self.set_font('Arial', 'B', 20)
-        self.set_text_color(0, 79, 159)
-        self.cell(0, 10, 'SCANMATCH REPORT', 0, 1, 'C')
-        self.ln(5)
-    def section_title(self, label):
-        self.set_font('Arial', 'B', 12)
-        self.set_fill_color(240, 240, 240)
-        self.set_text_color(0, 0, 0)
-        self.cell(0, 8, label, 0, 1, 'L', fill=True)
-        self.ln(2)
-    def body_text(self, text):
-        self.set_font('Arial', '', 10)
-        safe_text = text.encode('latin-1', 'replace').decode('latin-1')
-        self.multi_cell(0, 5, safe_text)
-        self.ln(2)
-
-def generar_pdf(contenido):
-    pdf = PDFJobScan()
-    pdf.add_page()
-    lines = contenido.split('\n')
-    for line in lines:
-        line = line.strip()
-        if not line: continue
-        if line.startswith("###"): pdf.section_title(line.replace("#","").strip())
-        else: pdf.body_text(line)
-    return pdf.output(dest='S').encode('latin-1')
-
-def leer_web(url):
-    try:
-        r = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=5)
-        soup = BeautifulSoup(r.text, 'html.parser')
-        for t in soup(["script", "style", "nav", "footer"]): t.decompose()
-        return soup.get_text(separator=' ', strip=True)
-    except: return ""
+st.markdown(css_minificado(), unsafe_allow_html=True)
 
+# --- 7. UTILIDADES ---
 def leer_doc(archivo):
-    text = ""
-    if archivo.name.endswith(".pdf"):
-        reader = PdfReader(archivo)
-        for p in reader.pages: text += p.extract_text()
-    elif archivo.name.endswith(".docx"):
-        doc = Document(archivo)
-        text = "\n".join([p.text for p in doc.paragraphs])
-    return text
+    return extraer_texto(archivo.name, archivo.getvalue())
+
+def enviar_escaneo(cv, job):
+    """Manda el escaneo con IA a la cola; reenviar lo mismo (otra pestaña, un rerun) vuelve al mismo trabajo"""
+    version = f"{VERSION_PROMPT}-{VERSION_LEXICO}"
+    clave = CacheAnalisis.clave(cv, job, version, ",".join(MODELOS))
+    entrada = {'username': st.session_state['username'], 'cv': cv, 'job': job, 'version': version,
+               'clave': clave, 'streaming': st.session_state['modo_streaming']}
+    return cola_trabajos.enviar(st.session_state['username'], clave, entrada, historial.titulo_oferta(job))
+
+def mostrar_trabajo():
+    """Sondea el escaneo en la cola y dibuja lo que ya llegó; al terminar abre los resultados"""
+    trabajo = cola_trabajos.consultar(st.session_state['username'], st.session_state['trabajo'])
+    if trabajo and trabajo['estado'] == 'listo':
+        escaneo = historial.obtener(st.session_state['username'], trabajo['resultado']['id_escaneo'])
+        if escaneo: abrir_escaneo(escaneo)
+    if trabajo is None or trabajo['estado'] in ('listo', 'error'):
+        if trabajo and trabajo['error']: st.session_state['trabajo_error'] = trabajo['error']
+        st.session_state['trabajo'] = None
+        st.rerun()
+    if trabajo['estado'] == 'pendiente':
+        st.info(f"⏳ En cola: posición {trabajo['posicion']}")
+        return
+    local = st.session_state.get('trabajo_local')
+    if not local:  # Retomado desde otra sesión: no hay puntaje local para adelantar
+        st.info("Analizando...")
+        return
+    # El puntaje local ya está listo antes del primer fragmento
+    actual = parcial(trabajo['parcial'], local)
+    if actual.score is not None: dibujar_score(actual.score)
+    else: st.info("Analizando...")
+    if actual.resumen: st.markdown(actual.resumen)
+    t1, t2, t3 = st.tabs(["🔍 Palabras Clave", "⚙️ Formato", "💡 Consejos"])
+    t1.markdown(markdown_habilidades(actual))
+    if actual.chequeo_ats: t2.markdown(markdown_chequeo(actual))
+    if actual.consejos: t3.markdown(markdown_consejos(actual))
+
+def seguir_trabajo(id_trabajo):
+    """Callback de 'Seguir': retoma en esta sesión un escaneo enviado desde otra"""
+    st.session_state['trabajo'] = id_trabajo
+    st.session_state['trabajo_local'] = None
+
+def enviar_lote(cvs, ofertas):
+    """Manda el lote a la cola; reenviar los mismos archivos y ofertas vuelve al mismo trabajo"""
+    entrada = {'cvs': [(nombre, base64.b64encode(datos).decode('ascii')) for nombre, datos in cvs], 'ofertas': ofertas}
+    return cola_trabajos.enviar(st.session_state['username'], clave_lote(cvs, ofertas, ",".join(MODELOS)), entrada,
+                                f"{len(cvs)} CV(s) × {len(ofertas)} oferta(s)", LOTE)
+
+def mostrar_trabajo_lote():
+    """Sondea el lote en la cola y muestra las filas que ya llegaron; al terminar quedan como resultado"""
+    trabajo = cola_trabajos.consultar(st.session_state['username'], st.session_state['lote_trabajo'])
+    if trabajo is None or trabajo['estado'] in ('listo', 'error'):
+        if trabajo and trabajo['resultado']:
+            st.session_state['lote_resultados'] = trabajo['resultado']['filas']
+            st.session_state['lote_zip'] = None
+        if trabajo and trabajo['error']: st.session_state['lote_error'] = trabajo['error']
+        st.session_state['lote_trabajo'] = None
+        st.rerun()
+    if trabajo['estado'] == 'pendiente':
+        st.info(f"⏳ En cola: posición {trabajo['posicion']}")
+        return
+    avance = json.loads(trabajo['parcial']) if trabajo['parcial'] else None
+    if not avance:
+        st.info("Leyendo documentos...")
+        return
+    st.progress(len(avance['filas']) / avance['total'])
+    st.dataframe(avance['filas'], use_container_width=True)
+
+def seguir_lote(id_trabajo):
+    """Callback de 'Seguir' en la vista de lotes"""
+    st.session_state['lote_trabajo'] = id_trabajo
+
+def reportes_lote(filas):
+    """(nombre de archivo, Analisis, título) por cada fila del lote sin error"""
+    reportes = []
+    for fila in filas:
+        if fila['Error']: continue
+        nombre = re.sub(r'[^\w\-. ]+', '_', f"{fila['CV']} - {fila['Oferta']}")[:80]
+        analisis = Analisis(score=fila['Score'], resumen=fila['Resumen'] or "")
+        reportes.append((nombre, analisis, f"{fila['CV']} vs {fila['Oferta']}"))
+    return reportes
+
+def mostrar_vista_lote():
+    st.markdown("<h1 style='text-align:center;'>Escaneo por lotes</h1>", unsafe_allow_html=True)
+    st.markdown("<p style='text-align:center;'>Varios CVs contra una oferta, o un CV contra varias ofertas.</p>", unsafe_allow_html=True)
+
+    with st.container():
+        st.markdown('<div class="scanner-card">', unsafe_allow_html=True)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("### 1. Sube los currículums")
+            f_cvs = st.file_uploader("CVs (PDF/DOCX)", type=["pdf", "docx"], accept_multiple_files=True, label_visibility="collapsed", key="lote_cvs")
+        with col2:
+            st.markdown("### 2. Ofertas")
+            txt_ofertas = st.text_area("Una URL por línea, o el texto de una oferta", height=150, key="lote_ofertas")
+
+        c1, c2, c3 = st.columns([1, 2, 1])
+        with c2:
+            escanear = st.button("ESCANEAR LOTE")
+        if escanear:
+            cvs = [(f.name, f.getvalue()) for f in (f_cvs or [])]
+            ofertas = separar_ofertas(txt_ofertas)
+            if not cvs or not ofertas:
+                st.warning("Sube al menos un CV y una oferta.")
+            else:
+                try:
+                    st.session_state['lote_trabajo'] = enviar_lote(cvs, ofertas)
+                    st.session_state['lote_resultados'] = None
+                except ColaLlena:
+                    st.warning("Hay demasiados escaneos en curso. Intenta de nuevo en unos segundos.")
+
+        if st.session_state.get('lote_error'):
+            st.error(f"Error AI: {st.session_state.pop('lote_error')}")
+        if st.session_state.get('lote_trabajo'):
+            st.fragment(mostrar_trabajo_lote, run_every=1)()
+        else:
+            for id_trabajo, creado, estado, titulo in cola_trabajos.activos(st.session_state['username'], LOTE):
+                col1, col2 = st.columns([5, 1])
+                col1.caption(f"⏳ Lote {estado}: {titulo} · {time.strftime('%H:%M', time.localtime(creado))}")
+                col2.button("Seguir", key=f"trab_lote_{id_trabajo}", on_click=seguir_lote, args=(id_trabajo,))
+
+        if st.session_state.get('lote_resultados'):
+            st.dataframe(st.session_state['lote_resultados'], use_container_width=True)
+            st.download_button("Descargar CSV", filas_a_csv(st.session_state['lote_resultados']), "scores.csv", "text/csv")
+            if st.button("📄 Generar PDFs (zip)"):
+                with st.spinner("Generando reportes..."):
+                    st.session_state['lote_zip'] = obtener_renderizador_pdf().zip_reportes(
+                        reportes_lote(st.session_state['lote_resultados']))
+            if st.session_state.get('lote_zip'):
+                st.download_button("Descargar PDFs", st.session_state['lote_zip'], "reportes.zip", "application/zip")
+        st.markdown('</div>', unsafe_allow_html=True)
+
+def mostrar_entrevista():
+    trabajo = st.session_state['entrevista']
+    if trabajo.error:
+        st.error(f"Error audio: {trabajo.error}")
+        return
+    if trabajo.preguntas is None:
+        st.caption("Creando entrevista...")
+        return
+    for pregunta, audio in zip(trabajo.preguntas, trabajo.audios):
+        st.write(f"🗣️ **Pregunta:** {pregunta}")
+        if not audio.done(): st.caption("Sintetizando audio...")
+        elif audio.exception(): st.error(f"Error audio: {audio.exception()}")
+        else: st.audio(audio.result(), format='audio/mp3')
+    # Terminó mientras se sondeaba: un rerun completo apaga el auto-refresco
+    if trabajo.terminado() and st.session_state.get('entrevista_sondeo'):
+        st.session_state['entrevista_sondeo'] = False
+        st.rerun()
+
+def abrir_escaneo(escaneo):
+    """Pasa un escaneo del historial a la vista de resultados"""
+    datos = escaneo['secciones']
+    # Los escaneos anteriores al JSON guardaban secciones de Markdown
+    st.session_state['analisis'] = desde_markdown(escaneo['reporte']) if 'palabras' in datos else Analisis.desde_dict(datos)
+    st.session_state['score'] = escaneo['score']
+    st.session_state['job_content'] = escaneo['job']
+    st.session_state['pdf_data'] = None
+    st.session_state['id_escaneo'] = escaneo['id']
+    # Se repiten las últimas preguntas del escaneo: sin IA y con los mp3 del cache
+    preguntas = historial.ultimas_preguntas(st.session_state['username'], escaneo['id'])
+    st.session_state['entrevista'] = repetir_entrevista(preguntas, cache_audio) if preguntas else None
+    st.session_state['analyzed'] = True
+
+def cargar_escaneo(id_escaneo):
+    """Callback de 'Ver': abre un escaneo guardado en la vista de resultados"""
+    escaneo = historial.obtener(st.session_state['username'], id_escaneo)
+    if not escaneo: return
+    abrir_escaneo(escaneo)
+    st.session_state['modo_app'] = "Individual"
+
+def mostrar_vista_historial():
+    st.markdown("<h1 style='text-align:center;'>Historial de escaneos</h1>", unsafe_allow_html=True)
+    with st.container():
+        st.markdown('<div class="scanner-card">', unsafe_allow_html=True)
+        orden = st.radio("Ordenar por", ["fecha", "score"], horizontal=True)
+        pagina = st.session_state.get('historial_pagina', 0)
+        filas, total = historial.listar(st.session_state['username'], pagina, orden=orden)
+        if not total:
+            st.info("Todavía no hay escaneos guardados.")
+        for id_escaneo, creado, score, titulo in filas:
+            col1, col2, col3 = st.columns([2, 5, 1])
+            col1.markdown(f"**{score}%** · {time.strftime('%d/%m/%Y %H:%M', time.localtime(creado))}")
+            col2.write(titulo or "(oferta sin título)")
+            col3.button("Ver", key=f"hist_{id_escaneo}", on_click=cargar_escaneo, args=(id_escaneo,))
+
+        paginas = max(1, -(-total // historial.POR_PAGINA))
+        c1, c2, c3 = st.columns([1, 2, 1])
+        if c1.button("◀ Anterior", disabled=pagina == 0):
+            st.session_state['historial_pagina'] = pagina - 1
+            st.rerun()
+        c2.markdown(f"<p style='text-align:center;'>Página {pagina + 1} de {paginas}</p>", unsafe_allow_html=True)
+        if c3.button("Siguiente ▶", disabled=pagina + 1 >= paginas):
+            st.session_state['historial_pagina'] = pagina + 1
+            st.rerun()
+        st.markdown('</div>', unsafe_allow_html=True)
+
+def eliminar_oferta(id_oferta):
+    """Callback de 'Quitar' en las ofertas guardadas"""
+    obtener_indice_ofertas().eliminar(st.session_state['username'], id_oferta)
+    st.session_state['ranking'] = None
+
+def mostrar_vista_ofertas():
+    st.markdown("<h1 style='text-align:center;'>Mis ofertas</h1>", unsafe_allow_html=True)
+    st.markdown("<p style='text-align:center;'>Guarda las ofertas que sigues y ordénalas según tu CV; el análisis con IA, solo para las mejores.</p>", unsafe_allow_html=True)
+    indice = obtener_indice_ofertas()
+    username = st.session_state['username']
+
+    with st.container():
+        st.markdown('<div class="scanner-card">', unsafe_allow_html=True)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("### 1. Guarda ofertas")
+            txt_ofertas = st.text_area("Una URL por línea, o el texto de una oferta", height=150, key="ofertas_nuevas")
+            if st.button("Guardar ofertas"):
+                try:
+                    with st.spinner("Indexando..."):
+                        for etiqueta, valor in separar_ofertas(txt_ofertas):
+                            es_url = re.match(r"https?://", valor.strip())
+                            texto = leer_web(valor) if es_url else valor
+                            if texto: indice.agregar(username, historial.titulo_oferta(texto), texto, valor if es_url else "")
+                            else: st.warning(f"No se pudo leer {etiqueta}")
+                    st.session_state['ranking'] = None
+                except Exception as e:
+                    st.error(f"Error al indexar: {e}")
+        with col2:
+            st.markdown("### 2. Sube tu currículum")
+            f_cv = st.file_uploader("CV (PDF/DOCX)", type=["pdf", "docx"], label_visibility="collapsed", key="ofertas_cv")
+            top_k = st.number_input("Analizar con IA las primeras", min_value=1, max_value=10, value=3)
+
+        guardadas = indice.listar(username)
+        with st.expander(f"Ofertas guardadas ({len(guardadas)})"):
+            for id_oferta, creado, titulo, origen in guardadas:
+                c1, c2 = st.columns([6, 1])
+                c1.write(f"{titulo or '(oferta sin título)'} · {time.strftime('%d/%m/%Y', time.localtime(creado))}")
+                c2.button("Quitar", key=f"oferta_{id_oferta}", on_click=eliminar_oferta, args=(id_oferta,))
+
+        c1, c2, c3 = st.columns([1, 2, 1])
+        with c2:
+            ordenar = st.button("ORDENAR OFERTAS")
+        if ordenar:
+            cv = leer_doc(f_cv) if f_cv else st.session_state['cv_content']
+            if not cv or not guardadas:
+                st.warning("Sube tu CV y guarda al menos una oferta.")
+            else:
+                try:
+                    st.session_state['ranking'] = indice.rankear(username, cv)
+                    st.session_state['ranking_cv'] = cv
+                except Exception as e:
+                    st.error(f"Error AI: {e}")
+
+        ranking = st.session_state.get('ranking')
+        if ranking:
+            st.dataframe([{'Afinidad': r['afinidad'], 'Oferta': r['titulo'], 'Coinciden': ", ".join(r['coinciden']),
+                           'Faltan': ", ".join(r['faltan'])} for r in ranking], use_container_width=True)
+            if st.button(f"🤖 Analizar las {min(top_k, len(ranking))} primeras con IA"):
+                try:
+                    for r in ranking[:top_k]:
+                        job = indice.texto(username, r['id'])
+                        if job: enviar_escaneo(st.session_state['ranking_cv'], job)
+                    st.success("Análisis en cola: aparecerán en el Historial al terminar.")
+                except ColaLlena:
+                    st.warning("Hay demasiados escaneos en curso. Intenta de nuevo en unos segundos.")
+        st.markdown('</div>', unsafe_allow_html=True)
 
 # --- 8. LÓGICA DE FLUJO PRINCIPAL ---
 
@@ -277,8 +589,20 @@ else:
     </div>
     """, unsafe_allow_html=True)
 
+    # VISTA LOTE
+    if st.session_state.get('modo_app') == "Lote":
+        mostrar_vista_lote()
+
+    # VISTA HISTORIAL
+    elif st.session_state.get('modo_app') == "Historial":
+        mostrar_vista_historial()
+
+    # VISTA OFERTAS GUARDADAS
+    elif st.session_state.get('modo_app') == "Ofertas":
+        mostrar_vista_ofertas()
+
     # VISTA 1: INPUTS
-    if not st.session_state['analyzed']:
+    elif not st.session_state['analyzed']:
         st.markdown("<h1 style='text-align:center;'>Escanee su currículum hoy</h1>", unsafe_allow_html=True)
         st.markdown("<p style='text-align:center;'>Descubra cómo hacerlo destacar ante los empleadores.</p>", unsafe_allow_html=True)
 
@@ -308,39 +632,45 @@ else:
             st.markdown("<br>", unsafe_allow_html=True)
             c1, c2, c3 = st.columns([1, 2, 1])
             with c2:
-                if st.button("ESCANEA MI CURRÍCULUM"):
-                    if t_cv and t_job:
-                        with st.spinner("Analizando..."):
-                            st.session_state['cv_content'] = t_cv
-                            st.session_state['job_content'] = t_job
-                            
-                            prompt = f"""
-                            Analiza este CV contra esta Oferta como un experto ATS.
-                            Usa Markdown.
-                            1. SCORE: (0-100)
-                            2. RESUMEN: Diagnóstico breve.
-                            3. HABILIDADES DURAS: Lista las presentes y faltantes.
-                            4. HABILIDADES BLANDAS: Lista las presentes y faltantes.
-                            5. CHEQUEO ATS: Evalúa formato, fecha, imágenes.
-                            6. CONSEJOS: 3 tips de reclutador.
-
-                            CV: {t_cv[:15000]}
-                            OFERTA: {t_job[:15000]}
-                            """
-                            try:
-                                res = generar_contenido_seguro(prompt)
-                                st.session_state['analysis_result'] = res.text
-                                try:
-                                    score_match = re.search(r"SCORE:\s*(\d+)", res.text)
-                                    st.session_state['score'] = int(score_match.group(1)) if score_match else 50
-                                except: st.session_state['score'] = 50
-                                
-                                st.session_state['analyzed'] = True
-                                st.rerun()
-                            except Exception as e:
-                                st.error(f"Error AI: {e}")
-                    else:
-                        st.warning("Sube ambos archivos.")
+                escanear = st.button("ESCANEA MI CURRÍCULUM")
+                if escanear and not (t_cv and t_job):
+                    st.warning("Sube ambos archivos.")
+
+            if escanear and t_cv and t_job:
+                st.session_state['cv_content'] = t_cv
+                st.session_state['job_content'] = t_job
+                
+                local = puntuar(t_cv, t_job)
+                try:
+                    if st.session_state['modo_rapido']:
+                        # Sin IA: se resuelve en el mismo clic
+                        metricas.nueva_traza()
+                        with metricas.tramo("escaneo", rapido=True):
+                            analisis = desde_rapido(local, resumen_rapido(local))
+                            st.session_state['id_escaneo'] = historial.guardar_escaneo(
+                                st.session_state['username'], t_cv, t_job, analisis.score,
+                                analisis.a_dict(), a_markdown(analisis), "", "rapido")
+                        st.session_state['analisis'] = analisis
+                        st.session_state['score'] = analisis.score
+                        st.session_state['analyzed'] = True
+                        st.rerun()
+                    st.session_state['trabajo'] = enviar_escaneo(t_cv, t_job)
+                    st.session_state['trabajo_local'] = local
+                except ColaLlena:
+                    st.warning("Hay demasiados escaneos en curso. Intenta de nuevo en unos segundos.")
+                except Exception as e:
+                    st.error(f"Error AI: {e}")
+
+            if st.session_state.get('trabajo_error'):
+                st.error(f"Error AI: {st.session_state.pop('trabajo_error')}")
+            if st.session_state['trabajo']:
+                st.fragment(mostrar_trabajo, run_every=1)()
+            else:
+                for id_trabajo, creado, estado, titulo in cola_trabajos.activos(st.session_state['username']):
+                    col1, col2 = st.columns([5, 1])
+                    col1.caption(f"⏳ Escaneo {estado}: {titulo or '(oferta sin título)'} · "
+                                 f"{time.strftime('%H:%M', time.localtime(creado))}")
+                    col2.button("Seguir", key=f"trab_{id_trabajo}", on_click=seguir_trabajo, args=(id_trabajo,))
             st.markdown('</div>', unsafe_allow_html=True)
 
         # MARKETING
@@ -369,104 +699,68 @@ else:
     else:
         score = st.session_state['score']
         
-        st.markdown(f"""
+        st.markdown("""
         <div style="background:white; padding:20px; text-align:center; border-bottom:1px solid #ddd; margin-bottom:30px; border-radius:8px;">
             <h2>Resultados del Análisis ATS</h2>
         </div>
         """, unsafe_allow_html=True)
         
-        # --- LÓGICA DE GRÁFICO (CON O SIN PLOTLY) ---
-        try:
-            import plotly.graph_objects as go
-            fig = go.Figure(go.Indicator(
-                mode = "gauge+number",
-                value = score,
-                domain = {'x': [0, 1], 'y': [0, 1]},
-                title = {'text': "Match Rate"},
-                gauge = {
-                    'axis': {'range': [0, 100], 'tickwidth': 1, 'tickcolor': "darkblue"},
-                    'bar': {'color': "#004F9F"},
-                    'bgcolor': "white",
-                    'borderwidth': 2,
-                    'bordercolor': "gray",
-                    'steps': [
-                        {'range': [0, 50], 'color': '#FFCCCC'},
-                        {'range': [50, 75], 'color': '#FFF4CC'},
-                        {'range': [75, 100], 'color': '#CCFFCC'}],
-                    'threshold': {
-                        'line': {'color': "red", 'width': 4},
-                        'thickness': 0.75,
-                        'value': score}}))
-            fig.update_layout(height=300, margin=dict(l=20, r=20, t=30, b=20), paper_bgcolor="rgba(0,0,0,0)", font={'color': "black"})
-            st.plotly_chart(fig, use_container_width=True)
-        except ImportError:
-            # FALLBACK SI NO INSTALÓ PLOTLY
-            color = "#2ECC71" if score > 75 else ("#F1C40F" if score > 50 else "#E74C3C")
-            st.markdown(f"""
-            <div class="score-circle" style="border-color:{color};">
-                <span style="font-size:3.5rem; font-weight:800; color:#333;">{score}%</span>
-                <span style="font-size:1rem; color:#666; font-weight:600;">MATCH RATE</span>
-            </div>
-            <p style="text-align:center; color:#666;">(Instala 'plotly' para ver el gráfico Pro)</p>
-            """, unsafe_allow_html=True)
+        dibujar_score(score)
 
         with st.container():
             st.markdown('<div class="scanner-card">', unsafe_allow_html=True)
             t1, t2, t3, t4 = st.tabs(["🔍 Palabras Clave", "⚙️ Formato", "💡 Consejos", "📥 Herramientas"])
             
-            raw = st.session_state['analysis_result']
+            analisis = st.session_state['analisis']
             
             with t1:
+                if analisis.resumen: st.markdown(analisis.resumen)
                 st.info("Palabras clave encontradas vs faltantes:")
-                try:
-                    part = raw.split("HABILIDADES DURAS")[1].split("CHEQUEO ATS")[0]
-                    clean_part = part.replace("4.", "").replace("5.", "").replace("6.", "")
-                    st.markdown("### Habilidades Duras y Blandas")
-                    st.markdown(clean_part)
-                except: st.write(raw)
+                st.markdown("### Habilidades Duras y Blandas")
+                st.markdown(markdown_habilidades(analisis))
                 
             with t2:
                 st.info("Análisis de formato ATS:")
-                try:
-                    part = raw.split("CHEQUEO ATS")[1].split("CONSEJOS")[0]
-                    st.markdown(part)
-                except: st.write("Ver reporte completo.")
+                if analisis.chequeo_ats: st.markdown(markdown_chequeo(analisis))
+                else: st.write("Sin observaciones de formato.")
                 
             with t3:
                 st.success("Recomendaciones de experto:")
-                try:
-                    part = raw.split("CONSEJOS")[1]
-                    st.markdown(part)
-                except: st.write("Ver reporte completo.")
+                if analisis.consejos: st.markdown(markdown_consejos(analisis))
+                else: st.write("Sin consejos para este escaneo.")
                 
             with t4:
                 c_d1, c_d2 = st.columns(2)
                 with c_d1:
                     if st.button("📄 Generar Reporte PDF"):
-                        st.session_state['pdf_data'] = generar_pdf(raw)
+                        st.session_state['pdf_data'] = obtener_renderizador_pdf().pdf(analisis)
                     if st.session_state['pdf_data']:
                         st.download_button("Descargar PDF", st.session_state['pdf_data'], "Reporte.pdf", "application/pdf")
                 with c_d2:
+                    n_preguntas = st.number_input("Número de preguntas", min_value=1, max_value=10, value=1)
                     if st.button("🎧 Generar Audio Entrevista"):
                         if st.session_state['job_content']:
-                            try:
-                                with st.spinner("Creando entrevista..."):
-                                    prompt_audio = f"Actúa como reclutador para este puesto: {st.session_state['job_content'][:2000]}. Hazme una pregunta difícil y breve. NO USES ASTERISCOS NI FORMATO."
-                                    q = generar_contenido_seguro(prompt_audio)
-                                    
-                                    # LIMPIEZA DE AUDIO MEJORADA
-                                    texto_limpio = limpiar_texto_audio(q.text)
-                                    
-                                    tts = gTTS(texto_limpio, lang='es')
-                                    buf = io.BytesIO()
-                                    tts.write_to_fp(buf)
-                                    buf.seek(0)
-                                    st.session_state['audio_data'] = buf
-                                    st.write(f"🗣️ **Pregunta:** {texto_limpio}")
-                            except Exception as e: st.error(f"Error audio: {e}")
+                            # Preguntas nuevas en cada clic; quedan como las últimas del escaneo para repetirlas
+                            username, id_escaneo = st.session_state['username'], st.session_state.get('id_escaneo')
+                            al_generar = (lambda p: historial.guardar_preguntas(username, id_escaneo, p)) if id_escaneo else None
+                            st.session_state['entrevista'] = lanzar_entrevista(
+                                st.session_state['job_content'][:2000], n_preguntas, generar_contenido_seguro,
+                                cache_audio=cache_audio, al_generar=al_generar)
                         else: st.error("Error de contexto.")
                         
-                    if st.session_state['audio_data']:
-                        st.audio(st.session_state['audio_data'], format='audio/mp3')
+                    if st.session_state['entrevista']:
+                        sondear = not st.session_state['entrevista'].terminado()
+                        st.session_state['entrevista_sondeo'] = sondear
+                        st.fragment(mostrar_entrevista, run_every=1 if sondear else None)()
 
-            st.markdown('</div>', unsafe_allow_html=True)
\ No newline at end of file
+            st.markdown('</div>', unsafe_allow_html=True)
+
+# --- 9. TIEMPOS ---
+# Los reruns cortados por st.rerun()/st.stop() no llegan hasta acá
+registro_tiempos = obtener_registro_tiempos()
+registro_tiempos.registrar(time.perf_counter() - T_INICIO, T_IMPORTACIONES)
+metricas.observar("rerun_segundos", time.perf_counter() - T_INICIO, ayuda="Duración de cada ejecución del script")
+with st.sidebar:
+    t = registro_tiempos.resumen()
+    st.caption(f"⏱️ Arranque: {t['arranque_ms']} ms (imports {t['importaciones_ms']} ms) · "
+               f"Rerun p50/p95: {t['p50_ms']}/{t['p95_ms']} ms en {t['reruns']}")
@@ -0,0 +1,130 @@
+import hashlib
+import io
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import metricas
+
+# --- ENTREVISTA EN AUDIO ---
+# La pregunta y el TTS corren en hilos de fondo para que la página de
+# resultados siga respondiendo. Cada clic pide preguntas nuevas (la gracia es
+# practicar con otras) y `al_generar` las guarda; al volver a un escaneo se
+# repiten las últimas y sus mp3 salen del cache en disco (por hash de texto e
+# idioma, con un tope de tamaño). Con N preguntas se sintetizan en paralelo y
+# la UI reproduce la primera apenas está lista.
+
+DIR_AUDIO = 'cache_audio'
+MAX_BYTES_AUDIO = 200 * 1024 * 1024
+HILOS = 4
+
+PROMPT_ENTREVISTA = ("Actúa como reclutador para este puesto: {job}. Hazme {n} preguntas difíciles y breves, "
+                     "una por línea y sin numerar. NO USES ASTERISCOS NI FORMATO.")
+
+_pool = ThreadPoolExecutor(max_workers=HILOS, thread_name_prefix="audio")
+
+
+def limpiar_texto_audio(texto):
+    """Elimina markdown para que el audio suene natural"""
+    texto = re.sub(r'[\*#_`~]', '', texto) # Quita simbolos
+    texto = re.sub(r'^\s*-\s+', '', texto, flags=re.MULTILINE) # Quita guiones de lista
+    texto = texto.replace("Score:", "Puntaje:").replace("/", " de ")
+    return texto
+
+
+class CacheAudio:
+    def __init__(self, directorio=DIR_AUDIO, max_bytes=MAX_BYTES_AUDIO):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, texto, lang):
+        h = hashlib.sha256(f"{lang}\x00{texto}".encode('utf-8')).hexdigest()
+        return os.path.join(self.directorio, f"{h}.mp3")
+
+    def obtener(self, texto, lang):
+        ruta = self._ruta(texto, lang)
+        try:
+            with open(ruta, 'rb') as f: datos = f.read()
+        except FileNotFoundError:
+            return None
+        os.utime(ruta)  # El mtime hace de "último acceso" para el desalojo
+        return datos
+
+    def guardar(self, texto, lang, datos):
+        ruta = self._ruta(texto, lang)
+        tmp = f"{ruta}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f: f.write(datos)
+        os.replace(tmp, ruta)
+        self._recortar()
+
+    def _recortar(self):
+        with self._lock:
+            archivos = []
+            for entrada in os.scandir(self.directorio):
+                if entrada.name.endswith('.mp3'):
+                    info = entrada.stat()
+                    archivos.append((info.st_mtime, info.st_size, entrada.path))
+            total = sum(a[1] for a in archivos)
+            for _, tam, ruta in sorted(archivos):
+                if total <= self.max_bytes: break
+                try: os.remove(ruta)
+                except FileNotFoundError: pass
+                total -= tam
+
+
+def sintetizar(texto, lang='es', cache=None):
+    datos = cache.obtener(texto, lang) if cache else None
+    metricas.cache("audio", datos is not None)
+    if datos is None:
+        from gtts import gTTS  # Solo quien pide la entrevista paga la importación
+        buf = io.BytesIO()
+        with metricas.tramo("tts", lang=lang):
+            gTTS(texto, lang=lang).write_to_fp(buf)
+        datos = buf.getvalue()
+        if cache: cache.guardar(texto, lang, datos)
+    return datos
+
+
+class TrabajoEntrevista:
+    def __init__(self, n):
+        self.n = n
+        self.preguntas = None
+        self.audios = []  # Futuros con los bytes mp3, en el orden de las preguntas
+        self.error = None
+
+    def terminado(self):
+        if self.error is not None: return True
+        return self.preguntas is not None and all(f.done() for f in self.audios)
+
+
+def _ejecutar(trabajo, job, generar, cache_audio, lang, al_generar):
+    try:
+        texto = generar(PROMPT_ENTREVISTA.format(job=job, n=trabajo.n)).text
+        preguntas = [limpiar_texto_audio(l).strip() for l in texto.splitlines()]
+        preguntas = [p for p in preguntas if p][:trabajo.n]
+        if al_generar: al_generar(preguntas)
+        _sintetizar_todas(trabajo, preguntas, cache_audio, lang)
+    except Exception as e:
+        trabajo.error = str(e)
+
+
+def _sintetizar_todas(trabajo, preguntas, cache_audio, lang):
+    trabajo.audios = [_pool.submit(sintetizar, p, lang, cache_audio) for p in preguntas]
+    trabajo.preguntas = preguntas  # Después de los futuros: la UI lee ambos juntos
+
+
+def lanzar_entrevista(job, n, generar, cache_audio=None, lang='es', al_generar=None):
+    """Arranca en segundo plano y devuelve el TrabajoEntrevista para sondearlo"""
+    trabajo = TrabajoEntrevista(n)
+    _pool.submit(_ejecutar, trabajo, job, generar, cache_audio, lang, al_generar)
+    return trabajo
+
+
+def repetir_entrevista(preguntas, cache_audio=None, lang='es'):
+    """TrabajoEntrevista con preguntas ya generadas; sin IA y con los mp3 del cache"""
+    trabajo = TrabajoEntrevista(len(preguntas))
+    _sintetizar_todas(trabajo, preguntas, cache_audio, lang)
+    return trabajo
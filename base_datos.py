@@ -0,0 +1,164 @@
+import hashlib
+import hmac
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# --- BASE DE DATOS ---
+# Pool de conexiones compartido por proceso sobre usuarios.db en modo WAL
+# (los lectores no se bloquean detrás de un escritor) con busy_timeout, y
+# contraseñas con KDF (scrypt, o PBKDF2 si el OpenSSL no trae scrypt). Los
+# hashes sha256 viejos se migran solos en el siguiente login correcto.
+
+RUTA_DB = 'usuarios.db'
+TAMANO_POOL = 8
+BUSY_TIMEOUT_MS = 5000
+
+SCRYPT_N = int(os.getenv("SCANMATCH_SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERACIONES = int(os.getenv("SCANMATCH_PBKDF2_ITER", "600000"))
+
+TTL_SESION = 300  # Segundos que un login verificado se reutiliza sin ir a la base
+MAX_SESIONES = 1024
+
+
+class PoolConexiones:
+    def __init__(self, ruta=RUTA_DB, tamano=TAMANO_POOL):
+        self.ruta = ruta
+        self.tamano = tamano
+        self._libres = queue.LifoQueue()
+        self._creadas = 0
+        self._lock = threading.Lock()
+
+    def _nueva(self):
+        conn = sqlite3.connect(self.ruta, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False,
+                               cached_statements=256)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+        return conn
+
+    @contextmanager
+    def conexion(self):
+        """Conexión prestada del pool; commit al salir, rollback si hubo error"""
+        try:
+            conn = self._libres.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                crear = self._creadas < self.tamano
+                if crear: self._creadas += 1
+            conn = self._nueva() if crear else self._libres.get()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._libres.put(conn)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def obtener_pool(ruta=RUTA_DB):
+    with _pools_lock:
+        if ruta not in _pools:
+            _pools[ruta] = PoolConexiones(ruta)
+        return _pools[ruta]
+
+
+# --- CONTRASEÑAS ---
+def hashear_password(password):
+    salt = os.urandom(16)
+    try:
+        h = hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P)
+        return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${h.hex()}"
+    except (AttributeError, ValueError):  # OpenSSL sin scrypt
+        h = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, PBKDF2_ITERACIONES)
+        return f"pbkdf2_sha256${PBKDF2_ITERACIONES}${salt.hex()}${h.hex()}"
+
+
+def verificar_password(password, almacenado):
+    """(correcta, hay_que_rehashear)"""
+    partes = almacenado.split('$')
+    if partes[0] == 'scrypt':
+        n, r, p, salt, esperado = int(partes[1]), int(partes[2]), int(partes[3]), partes[4], partes[5]
+        h = hashlib.scrypt(password.encode(), salt=bytes.fromhex(salt), n=n, r=r, p=p)
+        return hmac.compare_digest(h.hex(), esperado), (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    if partes[0] == 'pbkdf2_sha256':
+        iteraciones, salt, esperado = int(partes[1]), partes[2], partes[3]
+        h = hashlib.pbkdf2_hmac('sha256', password.encode(), bytes.fromhex(salt), iteraciones)
+        return hmac.compare_digest(h.hex(), esperado), iteraciones < PBKDF2_ITERACIONES
+    # Formato viejo: sha256 sin salt
+    legado = hashlib.sha256(password.encode()).hexdigest()
+    return hmac.compare_digest(legado, almacenado), True
+
+
+# --- CACHE DE SESIONES VERIFICADAS ---
+_secreto = os.urandom(32)  # Solo vive en memoria: la huella no sirve fuera del proceso
+_sesiones = OrderedDict()  # username -> (huella, fila, vence)
+_sesiones_lock = threading.Lock()
+
+
+def _huella(username, password):
+    return hmac.new(_secreto, f"{username}\x00{password}".encode(), 'sha256').digest()
+
+
+def _sesion_cacheada(username, password):
+    with _sesiones_lock:
+        entrada = _sesiones.get(username)
+        if not entrada: return None
+        huella, fila, vence = entrada
+        if time.time() > vence:
+            del _sesiones[username]
+            return None
+    return fila if hmac.compare_digest(huella, _huella(username, password)) else None
+
+
+def _cachear_sesion(username, password, fila):
+    with _sesiones_lock:
+        _sesiones[username] = (_huella(username, password), fila, time.time() + TTL_SESION)
+        _sesiones.move_to_end(username)
+        while len(_sesiones) > MAX_SESIONES: _sesiones.popitem(last=False)
+
+
+# --- USUARIOS ---
+def init_db():
+    with obtener_pool().conexion() as conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS users (username TEXT PRIMARY KEY, password TEXT, name TEXT, email TEXT)''')
+
+
+def crear_usuario(username, password, name, email):
+    pwd_hash = hashear_password(password)
+    try:
+        with obtener_pool().conexion() as conn:
+            conn.execute('INSERT INTO users VALUES (?,?,?,?)', (username, pwd_hash, name, email))
+        return True
+    except sqlite3.IntegrityError:
+        return False
+
+
+def verificar_login(username, password):
+    user = _sesion_cacheada(username, password)
+    if user: return user
+
+    with obtener_pool().conexion() as conn:
+        user = conn.execute('SELECT username, password, name, email FROM users WHERE username = ?', (username,)).fetchone()
+    if not user: return None
+    correcta, rehashear = verificar_password(password, user[1])
+    if not correcta: return None
+
+    if rehashear:
+        nuevo = hashear_password(password)
+        with obtener_pool().conexion() as conn:
+            conn.execute('UPDATE users SET password = ? WHERE username = ?', (nuevo, username))
+        user = (user[0], nuevo, user[2], user[3])
+    _cachear_sesion(username, password, user)
+    return user
@@ -0,0 +1,495 @@
+import argparse
+import hashlib
+import io
+import itertools
+import json
+import math
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- BENCHMARK ---
+# Mide latencia (p50/p95/p99) y operaciones por segundo a concurrencia
+# creciente sin gastar cuota de Gemini: un servidor falso de la API REST
+# (latencia configurable, 429 inyectados, streaming SSE o JSON, embeddings), un servidor
+# local de ofertas HTML y un corpus de CVs PDF/DOCX de 1 a 50 páginas.
+# Con --streamlit además recorre la app sin navegador (AppTest).
+#
+#   python benchmark.py --niveles 1,4,16 --ops 40 --latencia 0.4 --prob-429 0.05
+#
+# Lo que necesite una librería que no esté instalada se salta con un aviso.
+
+NIVELES = (1, 2, 4, 8, 16)
+OPS_POR_NIVEL = 32
+PAGINAS_CORPUS = (1, 5, 20, 50)
+LINEAS_POR_PAGINA = 40
+
+
+# --- SERVIDOR FALSO DE GEMINI ---
+def _campos_pedidos(cuerpo):
+    config = cuerpo.get("generationConfig") or cuerpo.get("generation_config") or {}
+    esquema = config.get("responseSchema") or config.get("response_schema") or {}
+    return list((esquema.get("properties") or {}).keys())
+
+
+def respuesta_falsa(prompt, campos):
+    """Texto con la forma que espera cada llamador: JSON del análisis, filas del lote o preguntas"""
+    if campos:
+        datos = {"score": random.randint(30, 95), "resumen": "Perfil alineado con la mayoría de los requisitos.",
+                 "chequeo_ats": [{"aspecto": "Formato", "estado": "ok", "detalle": "Secciones claras."},
+                                 {"aspecto": "Fechas", "estado": "mejorar", "detalle": "Usar mm/aaaa."}],
+                 "consejos": ["Cuantifica logros.", "Adapta el titular a la oferta.", "Quita la foto."]}
+        return json.dumps({c: datos[c] for c in campos if c in datos}, ensure_ascii=False)
+    pares = re.findall(r"PAR (\d+):", prompt)
+    if pares:
+        return "\n".join(f"PAR {n} | SCORE: {random.randint(30, 95)} | RESUMEN: Coincidencia parcial." for n in pares)
+    return "\n".join(f"¿Cómo resolverías el caso {i}?" for i in range(1, 11))
+
+
+def vector_falso(texto, dimension=256):
+    """Bolsa de palabras hasheada: textos con palabras en común dan vectores parecidos"""
+    vector = [0.0] * dimension
+    for palabra in re.findall(r"\w+", texto.lower()):
+        vector[int(hashlib.md5(palabra.encode('utf-8')).hexdigest(), 16) % dimension] += 1.0
+    return vector
+
+
+class _ManejadorGemini(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _json(self, estado, datos):
+        cuerpo = json.dumps(datos).encode('utf-8')
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_POST(self):
+        falso = self.server.falso
+        cuerpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        prompt = " ".join(p.get("text", "") for c in cuerpo.get("contents", []) for p in c.get("parts", []))
+        if ":countTokens" in self.path:
+            return self._json(200, {"totalTokens": len(prompt) // 4})
+
+        time.sleep(max(0.0, random.gauss(falso.latencia, falso.latencia * falso.jitter)))
+        if random.random() < falso.prob_429:
+            falso.contar("429")
+            return self._json(429, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED",
+                                              "message": "Resource has been exhausted (e.g. check quota)."}})
+        falso.contar("ok")
+        if ":batchEmbedContents" in self.path:
+            textos = [" ".join(p.get("text", "") for p in r.get("content", {}).get("parts", []))
+                      for r in cuerpo.get("requests", [])]
+            return self._json(200, {"embeddings": [{"values": vector_falso(t)} for t in textos]})
+        texto = respuesta_falsa(prompt, _campos_pedidos(cuerpo))
+
+        def fragmento(t, ultimo):
+            datos = {"candidates": [{"content": {"parts": [{"text": t}], "role": "model"}, "index": 0}]}
+            if ultimo:
+                datos["candidates"][0]["finishReason"] = "STOP"
+                datos["usageMetadata"] = {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(texto) // 4,
+                                          "totalTokenCount": (len(prompt) + len(texto)) // 4}
+            return datos
+
+        if ":streamGenerateContent" not in self.path:
+            return self._json(200, fragmento(texto, True))
+
+        # Streaming: SSE si se pidió alt=sse, si no un arreglo JSON que llega por partes
+        n = max(1, falso.fragmentos)
+        paso = math.ceil(len(texto) / n)
+        partes = [texto[i:i + paso] for i in range(0, len(texto), paso)] or [""]
+        sse = "alt=sse" in self.path
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream" if sse else "application/json")
+        self.end_headers()  # HTTP/1.0: el fin del cuerpo es el cierre de la conexión
+        if not sse: self.wfile.write(b"[")
+        for i, parte in enumerate(partes):
+            datos = json.dumps(fragmento(parte, i == len(partes) - 1))
+            self.wfile.write((f"data: {datos}\r\n\r\n" if sse else ("," if i else "") + datos).encode('utf-8'))
+            self.wfile.flush()
+            time.sleep(falso.latencia / n / 4)
+        if not sse: self.wfile.write(b"]")
+
+
+class GeminiFalso:
+    def __init__(self, latencia=0.3, jitter=0.3, prob_429=0.0, fragmentos=8):
+        self.latencia, self.jitter, self.prob_429, self.fragmentos = latencia, jitter, prob_429, fragmentos
+        self.respuestas = {}
+        self._lock = threading.Lock()
+        self.servidor = None
+
+    def contar(self, tipo):
+        with self._lock: self.respuestas[tipo] = self.respuestas.get(tipo, 0) + 1
+
+    def iniciar(self):
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), _ManejadorGemini)
+        self.servidor.falso = self
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.servidor.server_port}"
+
+
+# --- SERVIDOR DE OFERTAS ---
+def pagina_oferta(n, kb):
+    """HTML de oferta con ruido (nav, cookies, footer); las pares traen JobPosting en JSON-LD"""
+    habilidades = _habilidades()
+    pedidas = random.Random(n).sample(habilidades, min(12, len(habilidades)))
+    descripcion = "".join(f"<li>Experiencia con {h}</li>" for h in pedidas)
+    relleno = "<p>" + "Texto de relleno sobre la empresa y sus beneficios. " * max(1, kb * 1024 // 60) + "</p>"
+    json_ld = ""
+    if n % 2 == 0:
+        json_ld = ('<script type="application/ld+json">' + json.dumps(
+            {"@type": "JobPosting", "title": f"Puesto {n}", "description": f"<ul>{descripcion}</ul>"}) + "</script>")
+    return (f"<html><head><title>Oferta {n}</title>{json_ld}</head><body>"
+            "<nav>Inicio | Empleos | Inicia sesión</nav><div class='cookie'>Usamos cookies</div>"
+            f"<div class='job-description'><h1>Puesto {n}</h1><h2>Requisitos</h2><ul>{descripcion}</ul></div>"
+            f"{relleno}<footer>Todos los derechos reservados</footer></body></html>")
+
+
+class _ManejadorOfertas(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        m = re.match(r"/oferta/(\d+)", self.path)
+        if not m:
+            self.send_error(404)
+            return
+        kb = int((re.search(r"kb=(\d+)", self.path) or [0, "20"])[1])
+        cuerpo = pagina_oferta(int(m.group(1)), kb).encode('utf-8')
+        etag = '"' + hashlib.md5(cuerpo).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+
+def iniciar_ofertas():
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _ManejadorOfertas)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{servidor.server_port}"
+
+
+# --- CORPUS ---
+def _habilidades():
+    from puntaje_local import HABILIDADES_DURAS, HABILIDADES_BLANDAS
+    return sorted(HABILIDADES_DURAS) + sorted(HABILIDADES_BLANDAS)
+
+
+def lineas_cv(paginas, semilla):
+    rnd = random.Random(semilla)
+    habilidades = _habilidades()
+    lineas = ["Ana Pérez", "EXPERIENCIA"]
+    for i in range(paginas * LINEAS_POR_PAGINA):
+        if i % 15 == 0: lineas.append(rnd.choice(["PROYECTOS", "EXPERIENCIA", "HABILIDADES", "EDUCACIÓN"]))
+        lineas.append(f"- Lideré la migración de {rnd.choice(habilidades)} y {rnd.choice(habilidades)}, "
+                      f"reduciendo costos un {rnd.randint(5, 60)}% en {rnd.randint(1, 12)} meses.")
+    return lineas
+
+
+def generar_corpus(paginas=PAGINAS_CORPUS):
+    """[(nombre, bytes)] con un PDF y un DOCX por cantidad de páginas"""
+    corpus = []
+    try:
+        from fpdf import FPDF
+        for n in paginas:
+            pdf = FPDF()
+            pdf.set_font("Helvetica", size=9)
+            for i, linea in enumerate(lineas_cv(n, n)):
+                if i % LINEAS_POR_PAGINA == 0: pdf.add_page()
+                pdf.multi_cell(0, 5, linea.encode('latin-1', 'replace').decode('latin-1'), new_x="LMARGIN", new_y="NEXT")
+            corpus.append((f"cv_{n}p.pdf", bytes(pdf.output())))
+    except ImportError:
+        print("  (sin fpdf2: el corpus no trae PDF)")
+    try:
+        from docx import Document
+        for n in paginas:
+            doc = Document()
+            for linea in lineas_cv(n, n): doc.add_paragraph(linea)
+            buf = io.BytesIO()
+            doc.save(buf)
+            corpus.append((f"cv_{n}p.docx", buf.getvalue()))
+    except ImportError:
+        print("  (sin python-docx: el corpus no trae DOCX)")
+    return corpus
+
+
+# --- MEDICIÓN ---
+def percentil(valores, p):
+    if not valores: return float("nan")
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def medir(nombre, funcion, niveles, ops):
+    """funcion(i) por cada operación; una fila de resultados por nivel de concurrencia"""
+    filas = []
+    for concurrencia in niveles:
+        latencias, errores = [], []
+
+        def una(i):
+            t0 = time.perf_counter()
+            try:
+                funcion(i)
+                latencias.append(time.perf_counter() - t0)
+            except Exception as e:
+                errores.append(str(e))
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+            list(pool.map(una, range(ops)))
+        total = time.perf_counter() - t0
+        fila = {"bench": nombre, "concurrencia": concurrencia, "ops": ops, "errores": len(errores),
+                "p50_ms": percentil(latencias, 50) * 1000, "p95_ms": percentil(latencias, 95) * 1000,
+                "p99_ms": percentil(latencias, 99) * 1000, "ops_s": len(latencias) / total if total else 0.0}
+        filas.append(fila)
+        print(f"  {nombre:<24} c={concurrencia:<3} p50={fila['p50_ms']:8.1f}ms p95={fila['p95_ms']:8.1f}ms "
+              f"p99={fila['p99_ms']:8.1f}ms {fila['ops_s']:7.1f} ops/s errores={len(errores)}")
+        if errores: print(f"    primer error: {errores[0][:200]}")
+    return filas
+
+
+def _requiere(*modulos):
+    faltan = []
+    for m in modulos:
+        try:
+            __import__(m)
+        except ImportError:
+            faltan.append(m)
+    if faltan: print(f"  (se salta: falta {', '.join(faltan)})")
+    return not faltan
+
+
+# --- BENCHMARKS DE FUNCIONES ---
+def bench_funciones(args, url_gemini, url_ofertas, corpus):
+    from analisis import (Analisis, ChequeoATS, Habilidades, completar, config_json, campos_ia,
+                          construir_prompt_analisis, parsear_json_parcial, extraer_secciones)
+    from compactacion import compactar
+    from documentos import extraer_texto, LIMITE_CARACTERES
+    from puntaje_local import puntuar
+    from web import leer_web
+
+    filas = []
+    unico = itertools.count(1)  # Un límite distinto por llamada esquiva el memo de documentos
+    if corpus:
+        print("leer_doc (sin memo: cada operación usa otro límite de caracteres)")
+        for nombre, datos in corpus:
+            filas += medir(f"leer_doc {nombre}",
+                           lambda i, n=nombre, d=datos: extraer_texto(n, d, LIMITE_CARACTERES + next(unico)),
+                           args.niveles, args.ops)
+
+    print("leer_web (URL distinta por operación, sin cache)")
+    filas += medir("leer_web", lambda i: leer_web(f"{url_ofertas}/oferta/{i}?kb={args.kb_oferta}&r={random.random()}"),
+                   args.niveles, args.ops)
+
+    local = puntuar("\n".join(lineas_cv(2, 1)), leer_web(f"{url_ofertas}/oferta/2"))
+    texto_json = respuesta_falsa("", campos_ia(local["score"] is None))
+    print("parseo (validación del JSON y JSON parcial del streaming)")
+
+    def parseo(i):
+        completar(texto_json, local, "", None)
+        for corte in range(10, len(texto_json), max(1, len(texto_json) // 20)): parsear_json_parcial(texto_json[:corte])
+        extraer_secciones("SCORE: 70\n### HABILIDADES DURAS\nx\nCHEQUEO ATS\nbien\nCONSEJOS\n- uno")
+    filas += medir("parseo", parseo, args.niveles, args.ops)
+
+    hay_fpdf = _requiere("fpdf")
+    if hay_fpdf:
+        from reporte_pdf import renderizar
+        analisis = Analisis(score=78, resumen="Perfil sólido; falta experiencia en Kubernetes." * 5,
+                            duras=Habilidades(["python", "sql"], ["docker"]),
+                            chequeo_ats=[ChequeoATS("Fechas", "ok", "Formato mm/aaaa consistente.")] * 6,
+                            consejos=["Añade métricas de impacto."] * 5)
+        print("generar_pdf (render sin cache)")
+        filas += medir("generar_pdf", lambda i: renderizar(analisis, f"Reporte {i}"), args.niveles, args.ops)
+
+    if not _requiere("google.generativeai"):
+        return filas
+    import google.generativeai as genai
+    from despachador import DespachadorModelos
+    genai.configure(api_key="falsa", transport="rest", client_options={"api_endpoint": url_gemini})
+    despachador = DespachadorModelos(args.modelos, retraso_hedge=args.hedge)
+    config = config_json(campos_ia(local["score"] is None))
+
+    print("generar_contenido_seguro (servidor falso)")
+    filas += medir("generar_contenido_seguro", lambda i: despachador.generar(f"prompt {i}", generation_config=config),
+                   args.niveles, args.ops)
+    print("generar_contenido_stream (servidor falso)")
+    filas += medir("generar_contenido_stream",
+                   lambda i: "".join(despachador.generar_stream(f"prompt {i}", generation_config=config)),
+                   args.niveles, args.ops)
+
+    if _requiere("numpy"):
+        from indice_ofertas import IndiceOfertas
+        modelo = "models/text-embedding-004"
+        directorio = tempfile.mkdtemp(prefix="scanmatch_indice_")
+        indice = IndiceOfertas(lambda textos: genai.embed_content(model=modelo, content=textos)['embedding'],
+                               modelo, directorio, os.path.join(directorio, "indice.db"))
+        for n in range(args.ofertas):
+            indice.agregar("bench", f"Oferta {n}", leer_web(f"{url_ofertas}/oferta/{n}?kb={args.kb_oferta}"))
+        cv = "\n".join(lineas_cv(2, 1))
+        indice.rankear("bench", cv)  # Los vectores del CV quedan en cache
+        print(f"rankear ({args.ofertas} ofertas guardadas, CV ya vectorizado)")
+        filas += medir("rankear", lambda i: indice.rankear("bench", cv, 5), args.niveles, args.ops)
+
+    # Escaneo completo como en la vista individual, sin Streamlit
+    pdfs = [(n, d) for n, d in corpus if n.endswith(".pdf")] or corpus
+    if not pdfs: return filas
+
+    def escaneo(i):
+        nombre, datos = pdfs[i % len(pdfs)]
+        cv = extraer_texto(nombre, datos, LIMITE_CARACTERES + next(unico))
+        job = leer_web(f"{url_ofertas}/oferta/{i}?kb={args.kb_oferta}&r={random.random()}")
+        local = puntuar(cv, job)
+        prompt = construir_prompt_analisis(compactar(cv), compactar(job), local)
+        texto = despachador.generar(prompt, generation_config=config_json(campos_ia(local["score"] is None))).text
+        analisis, _, _ = completar(texto, local, prompt,
+                                   lambda p, c: despachador.generar(p, generation_config=config_json(c)).text)
+        if hay_fpdf: renderizar(analisis)
+    print("escaneo completo (leer_doc + leer_web + prompt + IA + validación + pdf)")
+    filas += medir("escaneo", escaneo, args.niveles, args.ops)
+    return filas
+
+
+# --- FLUJO STREAMLIT SIN NAVEGADOR ---
+class ArchivoSubido:
+    """Lo que la app usa de un UploadedFile de Streamlit"""
+    def __init__(self, nombre, datos):
+        self.name, self._datos = nombre, datos
+
+    def getvalue(self):
+        return self._datos
+
+
+def bench_streamlit(args, url_gemini, corpus):
+    """Arranque, login, escaneo completo, historial, resultados y PDF con AppTest; la app corre en un
+    directorio temporal. AppTest no sube archivos, pero corre la app en este proceso: st.file_uploader
+    se reemplaza por uno que entrega un CV del corpus al uploader del escaneo individual."""
+    if not _requiere("streamlit.testing.v1"):
+        return []
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+    ruta_app = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    os.environ.update({"GOOGLE_API_KEY": "falsa", "SCANMATCH_GEMINI_ENDPOINT": url_gemini})
+    os.chdir(tempfile.mkdtemp(prefix="scanmatch_bench_"))  # usuarios.db y cache_audio de prueba
+
+    import historial
+    from analisis import VERSION_PROMPT, completar, a_markdown
+    from base_datos import init_db, crear_usuario
+    from puntaje_local import puntuar, VERSION_LEXICO
+    init_db()
+    historial.init_historial()
+    crear_usuario("bench", "bench", "Bench", "bench@example.com")
+    cv, job = "\n".join(lineas_cv(2, 1)), pagina_oferta(2, 1)
+    local = puntuar(cv, job)
+    analisis, texto_ia, _ = completar(respuesta_falsa("", ["resumen", "chequeo_ats", "consejos"]), local, "", None)
+    id_escaneo = historial.guardar_escaneo("bench", cv, job, analisis.score or 50, analisis.a_dict(),
+                                           a_markdown(analisis), texto_ia, f"{VERSION_PROMPT}-{VERSION_LEXICO}")
+
+    pasos = {}
+
+    def registrar(nombre, segundos):
+        pasos.setdefault(nombre, []).append(segundos)
+
+    def paso(nombre, accion):
+        t0 = time.perf_counter()
+        at = accion()
+        registrar(nombre, time.perf_counter() - t0)
+        if at.exception: raise RuntimeError(f"{nombre}: {at.exception[0].message}")
+        return at
+
+    nombre_cv, datos_cv = next((n, d) for n, d in corpus if n.endswith((".pdf", ".docx")))
+    subir_original = st.file_uploader
+
+    def subir(label, *a, **k):
+        return None if k.get('accept_multiple_files') or k.get('key') else ArchivoSubido(nombre_cv, datos_cv)
+
+    st.file_uploader = subir
+    try:
+        for rep in range(args.repeticiones):
+            at = AppTest.from_file(ruta_app, default_timeout=120)
+            at = paso("primer run", at.run)
+            at.text_input(key="u_in").input("bench")
+            at.text_input(key="p_in").input("bench")
+            at = paso("login", next(b for b in at.button if b.label == "Iniciar Sesión").click().run)
+            at = paso("rerun", at.run)
+
+            # Escaneo real contra el Gemini falso: envío a la cola, sondeo y resultados.
+            # Cada repetición usa otra oferta para no salir del cache ni del deduplicado.
+            at.text_area[0].input(f"{job}\nReferencia {rep}-{time.time_ns()}")
+            t0 = time.perf_counter()
+            at = paso("escaneo envío", next(b for b in at.button if b.label == "ESCANEA MI CURRÍCULUM").click().run)
+            if not at.session_state['trabajo']: raise RuntimeError("escaneo envío: no quedó un trabajo en la cola")
+            while not at.session_state['analyzed']:
+                if time.perf_counter() - t0 > 120: raise RuntimeError("escaneo: el trabajo no terminó")
+                time.sleep(0.2)  # Lo que hace el fragmento con run_every
+                at = paso("escaneo sondeo", at.run)
+            registrar("escaneo hasta resultados", time.perf_counter() - t0)
+
+            at = paso("historial", at.radio(key="modo_app").set_value("Historial").run)
+            at = paso("ver resultado", at.button(key=f"hist_{id_escaneo}").click().run)
+            at = paso("generar pdf", next(b for b in at.button if b.label == "📄 Generar Reporte PDF").click().run)
+    finally:
+        st.file_uploader = subir_original
+
+    filas = []
+    print("streamlit (AppTest)")
+    for nombre, tiempos in pasos.items():
+        fila = {"bench": f"streamlit {nombre}", "concurrencia": 1, "ops": len(tiempos), "errores": 0,
+                "p50_ms": percentil(tiempos, 50) * 1000, "p95_ms": percentil(tiempos, 95) * 1000,
+                "p99_ms": percentil(tiempos, 99) * 1000, "ops_s": len(tiempos) / sum(tiempos)}
+        filas.append(fila)
+        print(f"  {nombre:<24} p50={fila['p50_ms']:8.1f}ms p95={fila['p95_ms']:8.1f}ms")
+    return filas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de ScanMatch contra servidores locales falsos")
+    parser.add_argument("--niveles", default=",".join(map(str, NIVELES)), help="Concurrencias, p.ej. 1,4,16")
+    parser.add_argument("--ops", type=int, default=OPS_POR_NIVEL, help="Operaciones por nivel")
+    parser.add_argument("--latencia", type=float, default=0.3, help="Latencia media del Gemini falso (s)")
+    parser.add_argument("--jitter", type=float, default=0.3, help="Desvío relativo de la latencia")
+    parser.add_argument("--prob-429", type=float, default=0.0, help="Probabilidad de responder 429")
+    parser.add_argument("--fragmentos", type=int, default=8, help="Fragmentos por respuesta en streaming")
+    parser.add_argument("--hedge", type=float, default=None, help="retraso_hedge del despachador (s)")
+    parser.add_argument("--modelos", default="gemini-2.5-flash,gemini-1.5-flash")
+    parser.add_argument("--kb-oferta", type=int, default=20, help="Tamaño aproximado de cada oferta HTML")
+    parser.add_argument("--ofertas", type=int, default=50, help="Ofertas guardadas para medir el ranking")
+    parser.add_argument("--paginas", default=",".join(map(str, PAGINAS_CORPUS)), help="Páginas de cada CV")
+    parser.add_argument("--streamlit", action="store_true", help="Recorrer también la app con AppTest")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Recorridos de la app con --streamlit")
+    parser.add_argument("--salida", help="Guardar los resultados en este JSON")
+    args = parser.parse_args(argv)
+    args.niveles = [int(n) for n in args.niveles.split(",")]
+    args.modelos = args.modelos.split(",")
+
+    falso = GeminiFalso(args.latencia, args.jitter, args.prob_429, args.fragmentos)
+    url_gemini = falso.iniciar()
+    url_ofertas = iniciar_ofertas()
+    print(f"Gemini falso en {url_gemini} · ofertas en {url_ofertas}")
+    print("Generando corpus...")
+    corpus = generar_corpus([int(p) for p in args.paginas.split(",")])
+
+    filas = bench_funciones(args, url_gemini, url_ofertas, corpus)
+    if args.streamlit: filas += bench_streamlit(args, url_gemini, corpus)
+    print(f"Respuestas del Gemini falso: {falso.respuestas}")
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "resultados": filas}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
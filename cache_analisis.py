@@ -0,0 +1,81 @@
+import hashlib
+import threading
+import time
+import re
+
+import metricas
+from base_datos import obtener_pool, RUTA_DB
+
+# --- CACHE PERSISTENTE DE ANÁLISIS ATS ---
+# Vive en la misma base que los usuarios (usuarios.db). La clave es un hash de
+# CV + oferta normalizados, versión del prompt y modelo, así un re-escaneo
+# idéntico no vuelve a pasar por la API.
+
+TTL_SEGUNDOS = 7 * 24 * 3600
+MAX_ENTRADAS = 2000
+
+
+def normalizar_texto(texto):
+    """Colapsa espacios para que cambios de formato no generen claves distintas"""
+    return re.sub(r'\s+', ' ', texto or '').strip()
+
+
+class CacheAnalisis:
+    def __init__(self, ruta=RUTA_DB, ttl=TTL_SEGUNDOS, max_entradas=MAX_ENTRADAS):
+        self.ruta = ruta
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+        self._pool = obtener_pool(ruta)
+        self._init_tabla()
+
+    def _init_tabla(self):
+        with self._pool.conexion() as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS cache_analisis (
+                            clave TEXT PRIMARY KEY, resultado TEXT,
+                            creado REAL, ultimo_acceso REAL)''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_acceso ON cache_analisis (ultimo_acceso)')
+
+    @staticmethod
+    def clave(cv, job, version, modelo):
+        h = hashlib.sha256()
+        for parte in (normalizar_texto(cv), normalizar_texto(job), str(version), str(modelo)):
+            h.update(parte.encode('utf-8'))
+            h.update(b'\x00')
+        return h.hexdigest()
+
+    def obtener(self, clave):
+        ahora = time.time()
+        with self._pool.conexion() as conn:
+            fila = conn.execute('SELECT resultado, creado FROM cache_analisis WHERE clave = ?', (clave,)).fetchone()
+            if fila and ahora - fila[1] <= self.ttl:
+                conn.execute('UPDATE cache_analisis SET ultimo_acceso = ? WHERE clave = ?', (ahora, clave))
+                with self._lock: self.aciertos += 1
+                metricas.cache("analisis", True)
+                return fila[0]
+            if fila:  # Expirado
+                conn.execute('DELETE FROM cache_analisis WHERE clave = ?', (clave,))
+        with self._lock: self.fallos += 1
+        metricas.cache("analisis", False)
+        return None
+
+    def guardar(self, clave, resultado):
+        ahora = time.time()
+        with self._pool.conexion() as conn:
+            conn.execute('INSERT OR REPLACE INTO cache_analisis VALUES (?,?,?,?)', (clave, resultado, ahora, ahora))
+            # Expira lo viejo y recorta por LRU al tamaño máximo
+            conn.execute('DELETE FROM cache_analisis WHERE creado < ?', (ahora - self.ttl,))
+            conn.execute('''DELETE FROM cache_analisis WHERE clave NOT IN (
+                            SELECT clave FROM cache_analisis ORDER BY ultimo_acceso DESC LIMIT ?)''',
+                         (self.max_entradas,))
+
+    def stats(self):
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': (self.aciertos / total) if total else 0.0,
+            }
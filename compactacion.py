@@ -0,0 +1,132 @@
+import re
+from collections import Counter
+
+from puntaje_local import extraer_habilidades
+
+# --- COMPACTACIÓN DEL PROMPT ---
+# En vez de cortar a ciegas en 15.000 caracteres: se quitan espacios, números
+# de página y los encabezados y pies que se repiten en el borde de las páginas
+# (documentos las separa con \f), se parte el texto en secciones, se ordenan
+# por relevancia y se meten las mejores hasta llenar el presupuesto de tokens,
+# en su orden original. Lo del medio de una página nunca se descarta: en un CV
+# una línea repetida ("Responsabilidades:") es contenido. Los avisos de cookies
+# o login de las webs de empleo los quita web.py, solo en las ofertas descargadas.
+
+PRESUPUESTO_TOKENS = 4000
+CARACTERES_POR_TOKEN = 4.0  # Estimación hasta medir con el contador del modelo
+MARGEN = 0.9  # Por debajo de esto del presupuesto no vale la pena medir
+MARGEN_MAX = 1.2  # Por encima se recorta igual, medir no cambiaría nada
+
+_RE_PAGINA = re.compile(r"^((p[aá]gina|page|p\.)\s*\d+(\s*(de|of|/)\s*\d+)?|\d{1,3}(\s*(de|of|/)\s*\d{1,3})?)$", re.I)
+LINEAS_BORDE = 2  # Líneas del principio y del final de cada página donde viven encabezados y pies
+
+# Palabra clave en el encabezado -> peso de la sección
+PESOS_ENCABEZADO = [
+    (r"requisit|requirement|qualification|perfil|profile|buscamos|looking for|debe", 5),
+    (r"experiencia|experience|trayectoria|employment|work history", 4),
+    (r"habilidad|skill|competencia|conocimiento|knowledge|tecnolog|herramient|stack", 4),
+    (r"responsabilidad|responsibilit|funciones|tareas|duties|what you.ll do", 3),
+    (r"formaci[oó]n|educaci[oó]n|education|estudios|certifica|idioma|language", 2),
+    (r"proyecto|project|logro|achievement|resumen|summary|perfil profesional", 2),
+    (r"beneficio|benefit|ofrecemos|we offer|sobre nosotros|about us|qui[eé]nes somos|empresa|company", -2),
+]
+_RE_PESOS = [(re.compile(p, re.I), w) for p, w in PESOS_ENCABEZADO]
+
+
+def limpiar(texto):
+    """Colapsa espacios, quita números de página y los encabezados/pies repetidos entre páginas (separadas por \f)"""
+    paginas = []
+    for pagina in (texto or "").split("\f"):
+        lineas = [re.sub(r"\s+", " ", l).strip() for l in pagina.splitlines()]
+        paginas.append([l for l in lineas if l and not _RE_PAGINA.match(l)])
+
+    def bordes(lineas):
+        """(posición desde arriba o desde abajo, línea) de las líneas del borde de una página"""
+        for i, linea in enumerate(lineas):
+            if i < LINEAS_BORDE: yield (i, linea.lower())
+            if len(lineas) - i <= LINEAS_BORDE: yield (i - len(lineas), linea.lower())
+
+    # Encabezado o pie: la misma línea en la misma posición en más de una página, pegada al
+    # borde (si la primera línea cambia, la segunda ya es contenido aunque se repita)
+    apariciones = Counter(b for lineas in paginas for b in set(bordes(lineas)))
+    repetidas = {b for b, n in apariciones.items() if n > 1}
+    resultado, vistas = [], set()
+    for lineas in paginas:
+        arriba = 0
+        while arriba < min(LINEAS_BORDE, len(lineas)) and (arriba, lineas[arriba].lower()) in repetidas: arriba += 1
+        abajo = 0
+        while abajo < min(LINEAS_BORDE, len(lineas) - arriba) and (-abajo - 1, lineas[-abajo - 1].lower()) in repetidas: abajo += 1
+        for i, linea in enumerate(lineas):
+            if i < arriba or i >= len(lineas) - abajo:
+                clave = linea.lower()
+                if clave in vistas: continue  # Se queda la primera aparición (p.ej. el nombre en el encabezado)
+                vistas.add(clave)
+            resultado.append(linea)
+    return resultado
+
+
+def _es_encabezado(linea):
+    if len(linea) > 60: return False
+    letras = [c for c in linea if c.isalpha()]
+    if linea.endswith(":") or (len(letras) >= 3 and all(c.isupper() for c in letras)):
+        return True
+    return len(linea.split()) <= 5 and any(r.search(linea) for r, _ in _RE_PESOS)
+
+
+def seccionar(lineas):
+    """[(encabezado, [líneas])]; lo anterior al primer encabezado va sin título"""
+    secciones = [("", [])]
+    for linea in lineas:
+        if _es_encabezado(linea):
+            secciones.append((linea, []))
+        else:
+            secciones[-1][1].append(linea)
+    return [(e, ls) for e, ls in secciones if e or ls]
+
+
+def relevancia(encabezado, lineas):
+    peso = sum(w for r, w in _RE_PESOS if r.search(encabezado))
+    cuerpo = " ".join(lineas)
+    habilidades = extraer_habilidades(cuerpo)
+    densidad = (len(habilidades["duras"]) + len(habilidades["blandas"])) / max(1, len(cuerpo) / 500)
+    return peso + densidad
+
+
+def compactar(texto, presupuesto=PRESUPUESTO_TOKENS, contar_tokens=None):
+    """Texto limpio que entra en `presupuesto` tokens, priorizando las secciones relevantes"""
+    lineas = limpiar(texto)
+    limpio = "\n".join(lineas)
+    ratio = CARACTERES_POR_TOKEN
+    if len(limpio) / ratio <= presupuesto * MARGEN:
+        return limpio
+    if contar_tokens and len(limpio) / ratio <= presupuesto * MARGEN_MAX:
+        try:
+            ratio = len(limpio) / max(1, contar_tokens(limpio))
+        except Exception:
+            pass  # Sin contador se sigue con la estimación
+        if len(limpio) / ratio <= presupuesto:
+            return limpio
+
+    secciones = seccionar(lineas)
+    orden = sorted(range(len(secciones)), key=lambda i: (-relevancia(*secciones[i]), i))
+    restante = presupuesto * ratio
+    elegidas = {}
+    for i in orden:
+        encabezado, cuerpo = secciones[i]
+        bloque = "\n".join(([encabezado] if encabezado else []) + cuerpo)
+        if len(bloque) + 1 <= restante:
+            elegidas[i] = bloque
+            restante -= len(bloque) + 1
+        elif restante > 200:  # La sección no entra entera: se recorta hasta donde quepa
+            parcial, usado = [], 0
+            for linea in bloque.split("\n"):
+                if usado + len(linea) + 1 > restante:
+                    corte = linea[:int(restante - usado)].rsplit(" ", 1)[0]
+                    if len(corte) > 100: parcial.append(corte)
+                    break
+                parcial.append(linea)
+                usado += len(linea) + 1
+            if len(parcial) > (1 if encabezado else 0):  # Un título solo no aporta
+                elegidas[i] = "\n".join(parcial)
+                restante -= sum(len(l) + 1 for l in parcial)
+    return "\n".join(elegidas[i] for i in sorted(elegidas))
@@ -0,0 +1,168 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import metricas
+
+# --- DESPACHADOR DE MODELOS ---
+# Reemplaza el bucle secuencial con time.sleep(5): cada modelo tiene su
+# circuito (abierto tras un 429 o varios errores seguidos, con backoff
+# exponencial + jitter) y, en modo hedged, el modelo de respaldo arranca
+# si el principal no respondió tras `retraso_hedge` segundos. Si se pasa un
+# limitador, cada llamada de generación espera su token antes de salir
+# (count_tokens tiene su propia cuota y no lo consume).
+
+UMBRAL_FALLOS = 3
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 60.0
+ESPERA_MAXIMA = 5.0  # Si todos los circuitos están abiertos, no se espera más que esto
+HILOS = 16
+
+
+def es_cuota(e):
+    return "429" in str(e) or "quota" in str(e).lower()
+
+
+def _registrar_fallo(nombre, e):
+    cuota = es_cuota(e)
+    metricas.contar("llamadas_modelo_total", ayuda="Intentos por modelo y resultado",
+                    modelo=nombre, resultado="cuota" if cuota else "error")
+    if cuota: metricas.contar("errores_429_total", ayuda="Respuestas 429 / cuota agotada", modelo=nombre)
+    return cuota
+
+
+def _registrar_exito(nombre, respuesta):
+    metricas.contar("llamadas_modelo_total", ayuda="Intentos por modelo y resultado", modelo=nombre, resultado="ok")
+    uso = getattr(respuesta, "usage_metadata", None)
+    if uso:
+        for tipo, campo in (("entrada", "prompt_token_count"), ("salida", "candidates_token_count")):
+            metricas.contar("tokens_total", getattr(uso, campo, 0) or 0, ayuda="Tokens de Gemini", modelo=nombre, tipo=tipo)
+
+
+class Circuito:
+    def __init__(self):
+        self.fallos = 0
+        self.abierto_hasta = 0.0
+        self.lock = threading.Lock()
+
+    def disponible(self, ahora):
+        return ahora >= self.abierto_hasta
+
+    def exito(self):
+        with self.lock:
+            self.fallos = 0
+            self.abierto_hasta = 0.0
+
+    def fallo(self, cuota):
+        with self.lock:
+            self.fallos += 1
+            if cuota or self.fallos >= UMBRAL_FALLOS:
+                espera = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (self.fallos - 1))
+                espera = espera / 2 + random.uniform(0, espera / 2)  # Jitter
+                self.abierto_hasta = time.time() + espera
+
+
+class DespachadorModelos:
+    def __init__(self, modelos, retraso_hedge=None, limitador=None):
+        self.modelos = list(modelos)
+        self.retraso_hedge = retraso_hedge
+        self.limitador = limitador
+        self.circuitos = {m: Circuito() for m in self.modelos}
+        self._instancias = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=HILOS, thread_name_prefix="gemini")
+
+    def _modelo(self, nombre):
+        with self._lock:
+            if nombre not in self._instancias:
+                import google.generativeai as genai  # Pesado: recién con la primera llamada
+                self._instancias[nombre] = genai.GenerativeModel(nombre)
+            return self._instancias[nombre]
+
+    def candidatos(self):
+        """Modelos con el circuito cerrado, en orden de preferencia"""
+        ahora = time.time()
+        libres = [m for m in self.modelos if self.circuitos[m].disponible(ahora)]
+        if libres:
+            return libres
+        # Todos abiertos: se espera (acotado) al primero que se reabra y se prueba ese
+        siguiente = min(self.modelos, key=lambda m: self.circuitos[m].abierto_hasta)
+        time.sleep(min(ESPERA_MAXIMA, max(0.0, self.circuitos[siguiente].abierto_hasta - ahora)))
+        return [siguiente]
+
+    def _esperar_cupo(self):
+        if self.limitador:
+            with metricas.tramo("espera_cupo"): self.limitador.adquirir()
+
+    def _llamar(self, nombre, prompt, kwargs):
+        self._esperar_cupo()
+        try:
+            with metricas.tramo("modelo", modelo=nombre):
+                respuesta = self._modelo(nombre).generate_content(prompt, **kwargs)
+        except Exception as e:
+            self.circuitos[nombre].fallo(_registrar_fallo(nombre, e))
+            raise
+        self.circuitos[nombre].exito()
+        _registrar_exito(nombre, respuesta)
+        return respuesta
+
+    def generar(self, prompt, **kwargs):
+        cola = self.candidatos()
+        errores = []
+        pendientes = {}
+
+        def lanzar(motivo=None):
+            nombre = cola.pop(0)
+            if motivo: metricas.contar("fallback_total", ayuda="Modelos de respaldo lanzados", modelo=nombre, motivo=motivo)
+            # El hilo del pool hereda la traza del escaneo
+            pendientes[self._pool.submit(metricas.en_contexto(self._llamar), nombre, prompt, kwargs)] = nombre
+
+        lanzar()
+        while pendientes:
+            # En modo hedged se deja como máximo un respaldo corriendo en paralelo
+            hedge = self.retraso_hedge is not None and cola and len(pendientes) < 2
+            hechos, _ = wait(pendientes, timeout=self.retraso_hedge if hedge else None, return_when=FIRST_COMPLETED)
+            if not hechos:
+                lanzar("hedge")
+                continue
+            for f in hechos:
+                nombre = pendientes.pop(f)
+                try:
+                    return f.result()
+                except Exception as e:
+                    errores.append(f"{nombre}: {str(e)}")
+            if cola and not pendientes: lanzar("error")
+        raise Exception(f"Error AI: {errores}")
+
+    def generar_stream(self, prompt, **kwargs):
+        """Entrega fragmentos de texto; solo cambia de modelo antes del primero"""
+        errores = []
+        for i, nombre in enumerate(self.candidatos()):
+            if i: metricas.contar("fallback_total", ayuda="Modelos de respaldo lanzados", modelo=nombre, motivo="error")
+            emitido, chunk = False, None
+            self._esperar_cupo()
+            try:
+                with metricas.tramo("modelo", modelo=nombre, stream=True):
+                    for chunk in self._modelo(nombre).generate_content(prompt, stream=True, **kwargs):
+                        try: fragmento = chunk.text
+                        except ValueError: continue  # Chunk sin texto (p.ej. solo metadatos)
+                        emitido = True
+                        yield fragmento
+                self.circuitos[nombre].exito()
+                _registrar_exito(nombre, chunk)  # El último chunk trae el uso de tokens
+                return
+            except Exception as e:
+                self.circuitos[nombre].fallo(_registrar_fallo(nombre, e))
+                if emitido: raise
+                errores.append(f"{nombre}: {str(e)}")
+        raise Exception(f"Error AI: {errores}")
+
+    def contar_tokens(self, texto):
+        """Tokens según el contador del modelo preferido (no consume cupo de generación)"""
+        return self._modelo(self.modelos[0]).count_tokens(texto).total_tokens
+
+    def estado(self):
+        ahora = time.time()
+        return {m: ("abierto" if not c.disponible(ahora) else "cerrado", c.fallos)
+                for m, c in self.circuitos.items()}
@@ -0,0 +1,138 @@
+import hashlib
+import io
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import metricas
+
+# --- EXTRACCIÓN DE DOCUMENTOS ---
+# Streamlit re-ejecuta el script en cada clic, así que el texto se memoiza por
+# hash de los bytes del archivo. Los PDF grandes se parsean por bloques de
+# páginas en procesos aparte y se corta apenas se llena el presupuesto del prompt.
+# Cada proceso recibe un PDF con solo sus páginas, y si una tanda no vuelve a
+# tiempo lo que falta se lee en este proceso.
+# pypdf y python-docx se importan recién con el primer archivo de cada tipo.
+
+# El doble de lo que suele entrar en el prompt: la compactación descarta
+# encabezados repetidos y ruido antes de recortar al presupuesto de tokens.
+LIMITE_CARACTERES = 30000
+PAGINAS_POR_BLOQUE = 4
+UMBRAL_PARALELO = 8  # Menos páginas que esto no compensa lanzar procesos
+PROCESOS = 4
+TIMEOUT_TANDA = 20  # Segundos por tanda de bloques antes de seguir sin procesos
+MAX_MEMO = 64
+
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _obtener_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Sin fork: el servidor ya tiene hilos corriendo (tornado, cola de trabajos,
+            # métricas) y un hijo forkeado con un lock tomado se cuelga
+            metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=PROCESOS, mp_context=multiprocessing.get_context(metodo))
+        return _pool
+
+
+def _descartar_pool():
+    """Tras un timeout o un proceso caído: el próximo PDF arranca un pool nuevo"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None: _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _bloque(reader, inicio, fin):
+    """Bytes de un PDF con solo esas páginas, para no mandar el documento entero a cada proceso"""
+    from pypdf import PdfWriter
+    writer = PdfWriter()
+    for i in range(inicio, fin): writer.add_page(reader.pages[i])
+    buf = io.BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
+
+
+def _extraer_paginas(datos):
+    """Texto de cada página de un bloque; corre en un proceso del pool"""
+    from pypdf import PdfReader
+    return [(p.extract_text() or "") for p in PdfReader(io.BytesIO(datos)).pages]
+
+
+def _extraer_pdf(datos, limite):
+    from pypdf import PdfReader
+    reader = PdfReader(io.BytesIO(datos))
+    total = len(reader.pages)
+    partes, largo, siguiente = [], 0, 0
+
+    if total >= UMBRAL_PARALELO:
+        # Se lanza una tanda de bloques por vez para poder cortar temprano
+        tanda = PAGINAS_POR_BLOQUE * PROCESOS
+        try:
+            pool = _obtener_pool()
+            for base in range(0, total, tanda):
+                fin_tanda = min(base + tanda, total)
+                futuros = [pool.submit(_extraer_paginas, _bloque(reader, i, min(i + PAGINAS_POR_BLOQUE, fin_tanda)))
+                           for i in range(base, fin_tanda, PAGINAS_POR_BLOQUE)]
+                vence = time.monotonic() + TIMEOUT_TANDA
+                textos = []
+                for f in futuros:  # Orden de página, no de llegada
+                    textos += f.result(timeout=max(0.0, vence - time.monotonic()))
+                partes += textos
+                largo += sum(len(t) for t in textos)
+                siguiente = fin_tanda
+                if largo >= limite: return "\f".join(partes)
+        except Exception as e:  # Timeout, proceso caído o página que no parsea: sigue en este proceso
+            metricas.contar("pdf_paralelo_fallos_total", ayuda="Tandas de PDF que se terminaron sin procesos",
+                            motivo=type(e).__name__)
+            _descartar_pool()
+
+    for i in range(siguiente, total):
+        texto = reader.pages[i].extract_text() or ""
+        partes.append(texto)
+        largo += len(texto)
+        if largo >= limite: break
+    return "\f".join(partes)  # \f entre páginas: compactación reconoce encabezados y pies
+
+
+def _extraer_docx(datos, limite):
+    from docx import Document
+    doc = Document(io.BytesIO(datos))
+    partes, largo = [], 0
+    for p in doc.paragraphs:
+        partes.append(p.text)
+        largo += len(p.text) + 1
+        if largo >= limite: break
+    return "\n".join(partes)
+
+
+def extraer_texto(nombre, datos, limite=LIMITE_CARACTERES):
+    """Texto de un PDF/DOCX, memoizado por hash de contenido"""
+    nombre = nombre.lower()
+    clave = (hashlib.sha256(datos).hexdigest(), nombre.rsplit('.', 1)[-1], limite)
+    with _memo_lock:
+        if clave in _memo:
+            _memo.move_to_end(clave)
+            metricas.cache("documentos", True)
+            return _memo[clave]
+    metricas.cache("documentos", False)
+
+    text = ""
+    with metricas.tramo("leer_doc", tipo=clave[1]) as traza:
+        if nombre.endswith(".pdf"):
+            text = _extraer_pdf(datos, limite)
+        elif nombre.endswith(".docx"):
+            text = _extraer_docx(datos, limite)
+        traza.update(bytes=len(datos), caracteres=len(text))
+
+    with _memo_lock:
+        _memo[clave] = text
+        while len(_memo) > MAX_MEMO: _memo.popitem(last=False)
+    return text
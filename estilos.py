@@ -0,0 +1,87 @@
+import re
+from functools import lru_cache
+
+# --- ESTILOS CSS ---
+# Streamlit arma la página de cero en cada rerun, así que el bloque se manda
+# siempre; se minifica una sola vez por proceso para que cada rerun envíe
+# menos bytes.
+
+CSS = """
+<style>
+    @import url('https://fonts.googleapis.com/css2?family=Open+Sans:wght@400;600;700;800&display=swap');
+    
+    /* ANIMACIÓN DE FONDO */
+    @keyframes gradient-animation {
+        0% { background-position: 0% 50%; }
+        50% { background-position: 100% 50%; }
+        100% { background-position: 0% 50%; }
+    }
+
+    .stApp {
+        background: linear-gradient(-45deg, #004F9F, #2563EB, #00d2ff, #F8C43A);
+        background-size: 400% 400%;
+        animation: gradient-animation 15s ease infinite;
+    }
+    
+    /* CAPA DE VIDRIO (TRANSPARENTE) */
+    .stApp::before {
+        content: ""; position: absolute; top: 0; left: 0; width: 100%; height: 100%;
+        background: rgba(255, 255, 255, 0.4); 
+        backdrop-filter: blur(12px);
+        z-index: -1;
+    }
+
+    html, body, [class*="css"] {
+        font-family: 'Open Sans', sans-serif;
+        color: #333;
+    }
+
+    /* NAVBAR */
+    .navbar {
+        background: rgba(255, 255, 255, 0.9);
+        padding: 15px 40px; border-bottom: 1px solid #ddd;
+        display: flex; justify-content: space-between; align-items: center; margin-bottom: 20px; border-radius: 8px;
+        backdrop-filter: blur(5px);
+    }
+    .brand { font-size: 24px; font-weight: 800; color: #004F9F; }
+    
+    /* CARDS */
+    .scanner-card {
+        background: rgba(255, 255, 255, 0.95);
+        border-radius: 8px; box-shadow: 0 8px 32px 0 rgba(31, 38, 135, 0.15);
+        padding: 30px; border: 1px solid rgba(255, 255, 255, 0.18); margin-bottom: 30px;
+        backdrop-filter: blur(4px);
+    }
+    .login-box {
+        max-width: 400px; margin: 50px auto; padding: 40px; 
+        background: rgba(255, 255, 255, 0.95);
+        border-radius: 12px; box-shadow: 0 8px 32px 0 rgba(31, 38, 135, 0.2); text-align: center;
+        border: 1px solid rgba(255, 255, 255, 0.18);
+    }
+    
+    /* BOTONES */
+    .stButton > button {
+        background-color: #F8C43A; color: #111; font-weight: 700; border: none;
+        padding: 12px 30px; font-size: 18px; width: 100%; text-transform: uppercase;
+        border-radius: 4px;
+        box-shadow: 0 4px 6px rgba(0,0,0,0.1);
+    }
+    .stButton > button:hover { background-color: #E5B020; transform: translateY(-1px); box-shadow: 0 6px 8px rgba(0,0,0,0.15); }
+    
+    /* SCORE FALLBACK (CSS) */
+    .score-circle {
+        width: 180px; height: 180px; border-radius: 50%;
+        display: flex; flex-direction: column; justify-content: center; align-items: center;
+        margin: 0 auto; border: 10px solid #ddd; background: white;
+    }
+    .icon-box { font-size: 30px; margin-bottom: 10px; }
+</style>
+"""
+
+
+@lru_cache(maxsize=1)
+def css_minificado():
+    css = re.sub(r"/\*.*?\*/", "", CSS, flags=re.S)  # Comentarios
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    return css.strip()
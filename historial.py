@@ -0,0 +1,163 @@
+import hashlib
+import json
+import time
+import zlib
+
+from base_datos import obtener_pool
+from cache_analisis import normalizar_texto
+from compactacion import limpiar, seccionar
+
+# --- HISTORIAL DE ESCANEOS ---
+# Cada escaneo queda en usuarios.db ligado al username: score, el análisis
+# estructurado (JSON) y el reporte comprimido. Al re-escanear un CV editado
+# contra la misma oferta solo se mandan a la IA las secciones del CV que
+# cambiaron, junto con el análisis anterior para que lo actualice. Las
+# últimas preguntas de entrevista de cada escaneo también quedan guardadas.
+
+POR_PAGINA = 10
+MAX_FRACCION_CAMBIADA = 0.5  # Si cambió más que esto del CV, conviene el análisis completo
+
+PROMPT_INCREMENTAL = """
+Actualiza este análisis ATS. El CV solo cambió en las secciones indicadas; el resto sigue igual.
+Responde con el mismo JSON y los mismos campos, y modifica solo lo que cambie por estas ediciones.
+
+ANÁLISIS ANTERIOR:
+{analisis}
+
+SECCIONES DEL CV MODIFICADAS O NUEVAS:
+{cambios}
+
+SECCIONES DEL CV ELIMINADAS: {eliminadas}
+
+OFERTA: {job}
+"""
+
+
+def _hash(texto):
+    return hashlib.sha256(normalizar_texto(texto).encode('utf-8')).hexdigest()
+
+
+def secciones_cv(cv):
+    """{encabezado: (hash, texto)} de las secciones del CV"""
+    resultado = {}
+    for encabezado, lineas in seccionar(limpiar(cv)):
+        cuerpo = "\n".join(lineas)
+        clave = encabezado or "(inicio)"
+        if clave in resultado:  # Encabezado repetido: se acumula en la misma sección
+            cuerpo = resultado[clave][1] + "\n" + cuerpo
+        resultado[clave] = (_hash(cuerpo), cuerpo)
+    return resultado
+
+
+def init_historial():
+    with obtener_pool().conexion() as conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS historial_escaneos (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            username TEXT NOT NULL, creado REAL NOT NULL, score INTEGER,
+                            hash_cv TEXT, hash_job TEXT, titulo TEXT, version TEXT,
+                            secciones TEXT, secciones_cv TEXT,
+                            reporte BLOB, reporte_ia BLOB, job BLOB)''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_hist_fecha ON historial_escaneos (username, creado DESC)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_hist_score ON historial_escaneos (username, score DESC)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_hist_job ON historial_escaneos (username, hash_job, version, creado DESC)')
+        conn.execute('''CREATE TABLE IF NOT EXISTS entrevistas (
+                            id_escaneo INTEGER PRIMARY KEY, username TEXT NOT NULL,
+                            creado REAL NOT NULL, preguntas TEXT NOT NULL)''')
+
+
+def _comprimir(texto):
+    return zlib.compress(texto.encode('utf-8'))
+
+
+def _descomprimir(blob):
+    return zlib.decompress(blob).decode('utf-8')
+
+
+def titulo_oferta(job):
+    """Primera línea con texto de la oferta, para listar escaneos"""
+    return (limpiar(job) or [""])[0][:80]
+
+
+def guardar_escaneo(username, cv, job, score, secciones, reporte, reporte_ia, version):
+    """`version` identifica prompt/léxico (o el escaneo rápido): solo se reescanea sobre la misma"""
+    titulo = titulo_oferta(job)
+    huellas = {k: h for k, (h, _) in secciones_cv(cv).items()}
+    with obtener_pool().conexion() as conn:
+        cur = conn.execute('INSERT INTO historial_escaneos (username, creado, score, hash_cv, hash_job, titulo, version, '
+                           'secciones, secciones_cv, reporte, reporte_ia, job) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)',
+                           (username, time.time(), score, _hash(cv), _hash(job), titulo, version,
+                            json.dumps(secciones, ensure_ascii=False), json.dumps(huellas),
+                            _comprimir(reporte), _comprimir(reporte_ia), _comprimir(job)))
+        return cur.lastrowid
+
+
+def listar(username, pagina=0, por_pagina=POR_PAGINA, orden='fecha'):
+    """(filas de la página, total); cada fila: id, creado, score, titulo"""
+    orden_sql = 'score DESC, creado DESC' if orden == 'score' else 'creado DESC'
+    with obtener_pool().conexion() as conn:
+        total = conn.execute('SELECT COUNT(*) FROM historial_escaneos WHERE username = ?', (username,)).fetchone()[0]
+        filas = conn.execute(f'SELECT id, creado, score, titulo FROM historial_escaneos WHERE username = ? '
+                             f'ORDER BY {orden_sql} LIMIT ? OFFSET ?',
+                             (username, por_pagina, pagina * por_pagina)).fetchall()
+    return filas, total
+
+
+def _a_dict(fila):
+    return {'id': fila[0], 'creado': fila[1], 'score': fila[2], 'titulo': fila[3],
+            'secciones': json.loads(fila[4]), 'secciones_cv': json.loads(fila[5]),
+            'reporte': _descomprimir(fila[6]), 'reporte_ia': _descomprimir(fila[7]), 'job': _descomprimir(fila[8])}
+
+
+_COLUMNAS = 'id, creado, score, titulo, secciones, secciones_cv, reporte, reporte_ia, job'
+
+
+def obtener(username, id_escaneo):
+    with obtener_pool().conexion() as conn:
+        fila = conn.execute(f'SELECT {_COLUMNAS} FROM historial_escaneos WHERE id = ? AND username = ?',
+                            (id_escaneo, username)).fetchone()
+    return _a_dict(fila) if fila else None
+
+
+def guardar_preguntas(username, id_escaneo, preguntas):
+    """Reemplaza las últimas preguntas de entrevista del escaneo"""
+    with obtener_pool().conexion() as conn:
+        conn.execute('INSERT OR REPLACE INTO entrevistas (id_escaneo, username, creado, preguntas) VALUES (?,?,?,?)',
+                     (id_escaneo, username, time.time(), json.dumps(preguntas, ensure_ascii=False)))
+
+
+def ultimas_preguntas(username, id_escaneo):
+    with obtener_pool().conexion() as conn:
+        fila = conn.execute('SELECT preguntas FROM entrevistas WHERE id_escaneo = ? AND username = ?',
+                            (id_escaneo, username)).fetchone()
+    return json.loads(fila[0]) if fila else None
+
+
+def ultimo_para_oferta(username, job, version):
+    """Escaneo más reciente del usuario contra la misma oferta y con la misma versión de prompt"""
+    with obtener_pool().conexion() as conn:
+        fila = conn.execute(f'SELECT {_COLUMNAS} FROM historial_escaneos WHERE username = ? AND hash_job = ? '
+                            'AND version = ? ORDER BY creado DESC LIMIT 1', (username, _hash(job), version)).fetchone()
+    return _a_dict(fila) if fila else None
+
+
+def planificar_reescaneo(base, cv):
+    """('reusar' | 'incremental' | 'completo', cambios, eliminadas) frente al escaneo base"""
+    if not base:
+        return 'completo', {}, []
+    actuales = secciones_cv(cv)
+    anteriores = base['secciones_cv']
+    cambios = {k: texto for k, (h, texto) in actuales.items() if anteriores.get(k) != h}
+    eliminadas = [k for k in anteriores if k not in actuales]
+    if not cambios and not eliminadas:
+        return 'reusar', {}, []
+    total = sum(len(t) for _, t in actuales.values()) or 1
+    if sum(len(t) for t in cambios.values()) / total > MAX_FRACCION_CAMBIADA:
+        return 'completo', {}, []
+    return 'incremental', cambios, eliminadas
+
+
+def prompt_incremental(base, cambios, eliminadas, job):
+    return PROMPT_INCREMENTAL.format(
+        analisis=base['reporte_ia'],
+        cambios="\n\n".join(f"{k}\n{t}" for k, t in cambios.items()) or "ninguna",
+        eliminadas=", ".join(eliminadas) or "ninguna", job=job)
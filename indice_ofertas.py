@@ -0,0 +1,238 @@
+import hashlib
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+
+import metricas
+from base_datos import obtener_pool, RUTA_DB
+from cache_analisis import normalizar_texto
+from compactacion import limpiar, seccionar
+
+# --- ÍNDICE SEMÁNTICO DE OFERTAS ---
+# Para quien sigue muchas ofertas: el CV y cada oferta guardada se parten en
+# trozos (una sección, cortada si es larga) y cada trozo se convierte en un
+# vector una sola vez; los vectores quedan en usuarios.db por hash del texto
+# y los de las ofertas de cada usuario forman además una matriz NumPy en
+# disco, ya normalizada. Ordenar las ofertas es una multiplicación de
+# matrices: cada trozo de la oferta vale lo que su trozo más parecido del CV,
+# y la oferta el promedio. El análisis completo con IA queda para las primeras.
+
+DIR_INDICE = 'cache_indice'  # Se regenera desde usuarios.db si falta
+MAX_CARACTERES_TROZO = 1500
+MIN_CARACTERES_TROZO = 40  # Encabezados sueltos y restos cortos no aportan
+TANDA_EMBEDDINGS = 100  # Textos por llamada (el máximo de la API)
+MAX_EMBEDDINGS = 200000
+SECCIONES_DESTACADAS = 3
+
+
+def trozos(texto):
+    """[(encabezado, texto)]: una entrada por sección, partida por líneas si pasa MAX_CARACTERES_TROZO"""
+    resultado = []
+    for encabezado, lineas in seccionar(limpiar(texto)):
+        actual, largo = [], 0
+        for linea in lineas:
+            if actual and largo + len(linea) > MAX_CARACTERES_TROZO:
+                resultado.append((encabezado, " ".join(actual)))
+                actual, largo = [], 0
+            actual.append(linea[:MAX_CARACTERES_TROZO])
+            largo += len(linea) + 1
+        resultado.append((encabezado, " ".join(actual)))
+    utiles = [(e, t) for e, t in resultado if len(e) + len(t) >= MIN_CARACTERES_TROZO]
+    return utiles or [(e, t) for e, t in resultado if e or t][:1]
+
+
+def _texto_trozo(encabezado, texto):
+    return f"{encabezado}\n{texto}".strip()
+
+
+def _etiqueta(encabezado, texto):
+    return encabezado or (texto[:60] + ("..." if len(texto) > 60 else ""))
+
+
+class IndiceOfertas:
+    def __init__(self, embeber, modelo, directorio=DIR_INDICE, ruta=RUTA_DB):
+        """embeber(textos) -> un vector por texto, en una sola llamada"""
+        self.embeber = embeber
+        self.modelo = modelo
+        self.directorio = directorio
+        self._pool = obtener_pool(ruta)
+        self._lock = threading.Lock()  # Escrituras de la matriz en disco
+        self._cargados = {}  # username -> (mtime, ids de oferta, n de trozo, matriz)
+        os.makedirs(directorio, exist_ok=True)
+        self._init_tablas()
+
+    def _init_tablas(self):
+        with self._pool.conexion() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS embeddings (clave TEXT PRIMARY KEY, vector BLOB)')
+            conn.execute('''CREATE TABLE IF NOT EXISTS ofertas_guardadas (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            username TEXT NOT NULL, creado REAL NOT NULL, titulo TEXT, origen TEXT,
+                            hash TEXT NOT NULL, texto BLOB)''')
+            conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_ofertas_hash ON ofertas_guardadas (username, hash)')
+            conn.execute('''CREATE TABLE IF NOT EXISTS trozos_oferta (
+                            oferta_id INTEGER NOT NULL, n INTEGER NOT NULL, encabezado TEXT, texto TEXT,
+                            PRIMARY KEY (oferta_id, n))''')
+
+    # --- VECTORES ---
+    def _clave(self, texto):
+        return hashlib.sha256(f"{self.modelo}\x00{normalizar_texto(texto)}".encode('utf-8')).hexdigest()
+
+    def vectores(self, textos):
+        """Matriz (len(textos), dimensión) normalizada; solo los textos nunca vistos van a la API"""
+        claves = [self._clave(t) for t in textos]
+        guardados = {}
+        with self._pool.conexion() as conn:
+            for i in range(0, len(claves), 500):  # Tope de parámetros de SQLite
+                parte = claves[i:i + 500]
+                guardados.update(conn.execute(f'SELECT clave, vector FROM embeddings WHERE clave IN '
+                                              f'({",".join("?" * len(parte))})', parte))
+        faltan = list({c: t for c, t in zip(claves, textos) if c not in guardados}.items())
+        metricas.contar("cache_total", len(claves) - len(faltan), ayuda="Consultas a caches", cache="embeddings", resultado="hit")
+        metricas.contar("cache_total", len(faltan), ayuda="Consultas a caches", cache="embeddings", resultado="miss")
+        nuevos = []
+        for i in range(0, len(faltan), TANDA_EMBEDDINGS):
+            tanda = faltan[i:i + TANDA_EMBEDDINGS]
+            with metricas.tramo("embeddings"):
+                calculados = self.embeber([t for _, t in tanda])
+            for (clave, _), v in zip(tanda, calculados):
+                v = np.asarray(v, dtype=np.float32)
+                guardados[clave] = (v / (np.linalg.norm(v) or 1.0)).tobytes()
+                nuevos.append((clave, guardados[clave]))
+        if nuevos:
+            with self._pool.conexion() as conn:
+                conn.executemany('INSERT OR REPLACE INTO embeddings VALUES (?,?)', nuevos)
+                conn.execute('DELETE FROM embeddings WHERE rowid <= (SELECT MAX(rowid) FROM embeddings) - ?',
+                             (MAX_EMBEDDINGS,))
+        if not claves: return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([np.frombuffer(guardados[c], dtype=np.float32) for c in claves])
+
+    # --- MATRIZ POR USUARIO ---
+    def _ruta(self, username):
+        return os.path.join(self.directorio, hashlib.sha256(username.encode('utf-8')).hexdigest()[:32] + ".npz")
+
+    def _reconstruir(self, username):
+        """Vuelve a escribir la matriz del usuario desde los trozos guardados (los vectores salen del cache)"""
+        with self._pool.conexion() as conn:
+            filas = conn.execute('SELECT t.oferta_id, t.n, t.encabezado, t.texto FROM trozos_oferta t '
+                                 'JOIN ofertas_guardadas o ON o.id = t.oferta_id WHERE o.username = ? '
+                                 'ORDER BY t.oferta_id, t.n', (username,)).fetchall()
+        ruta = self._ruta(username)
+        if not filas:
+            try: os.remove(ruta)
+            except FileNotFoundError: pass
+            return
+        matriz = self.vectores([_texto_trozo(e, t) for _, _, e, t in filas])
+        os.makedirs(self.directorio, exist_ok=True)  # Pudieron borrar el directorio con la app corriendo
+        tmp = f"{ruta}.{threading.get_ident()}.tmp.npz"
+        # float16 en disco: la mitad de espacio y sobra precisión para un coseno
+        np.savez(tmp, vectores=matriz.astype(np.float16), ofertas=np.array([f[0] for f in filas], dtype=np.int64),
+                 trozos=np.array([f[1] for f in filas], dtype=np.int32), modelo=np.array(self.modelo))
+        os.replace(tmp, ruta)
+
+    def _cargar(self, username):
+        """(ids de oferta, n de trozo, matriz) ordenados por oferta, o None si no hay ofertas"""
+        ruta = self._ruta(username)
+        try:
+            mtime = os.stat(ruta).st_mtime_ns
+        except FileNotFoundError:
+            # Redeploy, otro host o cache borrado: si el usuario tiene ofertas se rearma desde usuarios.db
+            with self._pool.conexion() as conn:
+                if not conn.execute('SELECT 1 FROM ofertas_guardadas WHERE username = ? LIMIT 1', (username,)).fetchone():
+                    return None
+            with self._lock:
+                if not os.path.exists(ruta): self._reconstruir(username)
+            try:
+                mtime = os.stat(ruta).st_mtime_ns
+            except FileNotFoundError:
+                return None
+        cargado = self._cargados.get(username)
+        if cargado and cargado[0] == mtime:  # Otro proceso pudo haber reescrito el archivo
+            return cargado[1:]
+        with np.load(ruta) as datos:
+            modelo = str(datos['modelo'])
+            cargado = (mtime, datos['ofertas'], datos['trozos'], datos['vectores'].astype(np.float32))
+        if modelo != self.modelo:  # Cambió el modelo: los vectores no son comparables
+            with self._lock: self._reconstruir(username)
+            return self._cargar(username)
+        self._cargados[username] = cargado
+        return cargado[1:]
+
+    # --- OFERTAS ---
+    def agregar(self, username, titulo, texto, origen=""):
+        """Id de la oferta; la misma oferta (texto normalizado) no se guarda dos veces"""
+        h = hashlib.sha256(normalizar_texto(texto).encode('utf-8')).hexdigest()
+        with self._pool.conexion() as conn:
+            fila = conn.execute('SELECT id FROM ofertas_guardadas WHERE username = ? AND hash = ?', (username, h)).fetchone()
+        if fila: return fila[0]
+        partes = trozos(texto)
+        if not partes: raise ValueError("La oferta no tiene texto")
+        self.vectores([_texto_trozo(e, t) for e, t in partes])  # Fuera del lock: la API es lo lento
+        with self._lock:
+            with self._pool.conexion() as conn:
+                fila = conn.execute('SELECT id FROM ofertas_guardadas WHERE username = ? AND hash = ?',
+                                    (username, h)).fetchone()
+                if fila: return fila[0]
+                id_oferta = conn.execute('INSERT INTO ofertas_guardadas (username, creado, titulo, origen, hash, texto) '
+                                         'VALUES (?,?,?,?,?,?)', (username, time.time(), titulo, origen, h,
+                                                                  zlib.compress(texto.encode('utf-8')))).lastrowid
+                conn.executemany('INSERT INTO trozos_oferta VALUES (?,?,?,?)',
+                                 [(id_oferta, n, e, t) for n, (e, t) in enumerate(partes)])
+            self._reconstruir(username)
+        return id_oferta
+
+    def eliminar(self, username, id_oferta):
+        with self._lock:
+            with self._pool.conexion() as conn:
+                borradas = conn.execute('DELETE FROM ofertas_guardadas WHERE id = ? AND username = ?',
+                                        (id_oferta, username)).rowcount
+                if borradas: conn.execute('DELETE FROM trozos_oferta WHERE oferta_id = ?', (id_oferta,))
+            if borradas: self._reconstruir(username)
+
+    def listar(self, username):
+        """id, creado, titulo, origen de las ofertas guardadas, la más nueva primero"""
+        with self._pool.conexion() as conn:
+            return conn.execute('SELECT id, creado, titulo, origen FROM ofertas_guardadas WHERE username = ? '
+                                'ORDER BY creado DESC', (username,)).fetchall()
+
+    def texto(self, username, id_oferta):
+        with self._pool.conexion() as conn:
+            fila = conn.execute('SELECT texto FROM ofertas_guardadas WHERE id = ? AND username = ?',
+                                (id_oferta, username)).fetchone()
+        return zlib.decompress(fila[0]).decode('utf-8') if fila else None
+
+    # --- RANKING ---
+    def rankear(self, username, cv, k=None):
+        """Ofertas ordenadas por afinidad con el CV: id, titulo, afinidad (0-100), coinciden y faltan
+        (las secciones de la oferta mejor y peor cubiertas por el CV)"""
+        indice = self._cargar(username)
+        partes = trozos(cv)
+        if indice is None or not partes: return []
+        ofertas, n_trozos, matriz = indice
+        consulta = self.vectores([_texto_trozo(e, t) for e, t in partes])
+        with metricas.tramo("rankear"):
+            cobertura = (consulta @ matriz.T).max(axis=0)  # Por trozo de oferta: su mejor trozo del CV
+            inicios = np.flatnonzero(np.r_[True, ofertas[1:] != ofertas[:-1]])
+            largos = np.diff(np.r_[inicios, len(ofertas)])
+            afinidad = np.add.reduceat(cobertura, inicios) / largos
+            orden = np.argsort(-afinidad, kind='stable')[:k]
+
+        elegidas = [int(ofertas[inicios[i]]) for i in orden]
+        marcas = ",".join("?" * len(elegidas))
+        with self._pool.conexion() as conn:
+            titulos = dict(conn.execute(f'SELECT id, titulo FROM ofertas_guardadas WHERE id IN ({marcas})', elegidas))
+            etiquetas = {(o, n): _etiqueta(e, t) for o, n, e, t in conn.execute(
+                f'SELECT oferta_id, n, encabezado, texto FROM trozos_oferta WHERE oferta_id IN ({marcas})', elegidas)}
+        resultado = []
+        for i, id_oferta in zip(orden, elegidas):
+            inicio, largo = inicios[i], largos[i]
+            por_cobertura = inicio + np.argsort(-cobertura[inicio:inicio + largo], kind='stable')
+            mitad = (largo + 1) // 2
+            def nombres(posiciones): return [etiquetas.get((id_oferta, int(n_trozos[p])), "") for p in posiciones]
+            resultado.append({'id': id_oferta, 'titulo': titulos.get(id_oferta, ""),
+                              'afinidad': max(0, round(float(afinidad[i]) * 100)),
+                              'coinciden': nombres(por_cobertura[:min(SECCIONES_DESTACADAS, mitad)]),
+                              'faltan': nombres(por_cobertura[mitad:][::-1][:SECCIONES_DESTACADAS])})
+        return resultado
@@ -0,0 +1,40 @@
+import threading
+import time
+
+# --- LIMITADOR DE PETICIONES ---
+# Un solo token bucket por proceso (compartido entre sesiones vía
+# st.cache_resource) marca el ritmo de las llamadas a Gemini según la cuota.
+# Cuántos escaneos corren a la vez lo decide la cola de trabajos (trabajos.py).
+
+
+class ColaLlena(Exception):
+    pass
+
+
+class LimitadorTokens:
+    def __init__(self, por_minuto, rafaga=None):
+        self.tasa = por_minuto / 60.0
+        self.capacidad = float(rafaga or max(1, por_minuto // 10))
+        self.tokens = self.capacidad
+        self.ultimo = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _recargar(self, ahora):
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.tasa)
+        self.ultimo = ahora
+
+    def adquirir(self, timeout=None):
+        """Bloquea hasta tener un token; False si vence el timeout"""
+        limite = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                ahora = time.monotonic()
+                self._recargar(ahora)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                espera = (1 - self.tokens) / self.tasa
+            if limite is not None:
+                if ahora >= limite: return False
+                espera = min(espera, limite - ahora)
+            time.sleep(espera)
@@ -0,0 +1,165 @@
+import csv
+import hashlib
+import io
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from cache_analisis import CacheAnalisis
+from documentos import extraer_texto
+from web import leer_web
+from compactacion import compactar
+
+# --- ESCANEO POR LOTES ---
+# N CVs contra una oferta, o un CV contra N ofertas. Las entradas se leen en
+# paralelo, las comparaciones cortas se empaquetan en un mismo prompt (cada
+# texto va una sola vez aunque participe en varios pares) y los paquetes se
+# mandan a la IA con concurrencia acotada; las filas salen a medida que terminan.
+# En la app el lote corre como un trabajo más de la cola (trabajos.py).
+
+VERSION_PROMPT_LOTE = 1
+PRESUPUESTO_TOKENS_TEXTO = 3000  # Cada documento se compacta a esto antes de empaquetar
+PRESUPUESTO_PROMPT = 24000  # Caracteres de documentos por prompt
+MAX_PARES_POR_PROMPT = 5
+HILOS_LECTURA = 8
+
+PROMPT_LOTE = """
+Eres un experto ATS. Compara cada par CV/OFERTA indicado usando los documentos de abajo.
+Responde SOLO con una línea por par, en este formato exacto y sin Markdown:
+PAR <n> | SCORE: <0-100> | RESUMEN: <diagnóstico en una frase>
+
+{documentos}
+
+PARES A EVALUAR:
+{pares}
+"""
+
+_RE_FILA = re.compile(r"PAR\s*(\d+)\s*\|\s*SCORE\W*(\d+)\s*\|\s*RESUMEN:\s*(.*)")
+
+
+def separar_ofertas(texto):
+    """Una URL por línea, o el bloque completo como una sola oferta pegada"""
+    lineas = [l.strip() for l in (texto or "").splitlines() if l.strip()]
+    if lineas and all(re.match(r"https?://", l) for l in lineas):
+        return [(l, l) for l in lineas]
+    return [("Oferta pegada", texto)] if lineas else []
+
+
+def clave_lote(cvs, ofertas, modelos=""):
+    """Los mismos archivos y ofertas dan la misma clave: reenviar el lote vuelve al trabajo que ya existe"""
+    h = hashlib.sha256(f"lote-{VERSION_PROMPT_LOTE}\x00{modelos}".encode('utf-8'))
+    for nombre, datos in cvs: h.update(f"\x00{nombre}\x00".encode('utf-8') + hashlib.sha256(datos).digest())
+    for etiqueta, valor in ofertas: h.update(f"\x00{etiqueta}\x00{valor}".encode('utf-8'))
+    return h.hexdigest()
+
+
+def leer_entradas(cvs, ofertas):
+    """cvs: [(nombre, bytes)], ofertas: [(etiqueta, url o texto)] -> textos en paralelo"""
+    def leer_oferta(valor):
+        return leer_web(valor) if re.match(r"https?://", valor.strip()) else valor
+
+    def texto(futuro):
+        # Un archivo dañado queda como texto vacío: sale como fila con error y el resto del lote sigue
+        try:
+            return compactar(futuro.result(), PRESUPUESTO_TOKENS_TEXTO)
+        except Exception:
+            return ""
+
+    with ThreadPoolExecutor(max_workers=HILOS_LECTURA) as pool:
+        f_cvs = [(n, pool.submit(extraer_texto, n, d)) for n, d in cvs]
+        f_ofs = [(e, pool.submit(leer_oferta, v)) for e, v in ofertas]
+        textos_cv = [(n, texto(f)) for n, f in f_cvs]
+        textos_of = [(e, texto(f)) for e, f in f_ofs]
+    return textos_cv, textos_of
+
+
+def empaquetar(pares):
+    """Agrupa pares mientras los documentos únicos entren en el presupuesto"""
+    paquetes, actual, textos = [], [], set()
+    for par in pares:
+        nuevos = {par['cv_texto'], par['job_texto']} - textos
+        extra = sum(len(t) for t in nuevos)
+        if actual and (len(actual) >= MAX_PARES_POR_PROMPT or
+                       sum(len(t) for t in textos) + extra > PRESUPUESTO_PROMPT):
+            paquetes.append(actual)
+            actual, textos = [], set()
+        actual.append(par)
+        textos |= {par['cv_texto'], par['job_texto']}
+    if actual: paquetes.append(actual)
+    return paquetes
+
+
+def construir_prompt(paquete):
+    ids, documentos, lineas = {}, [], []
+    cuenta = {"CV": 0, "OFERTA": 0}
+    for n, par in enumerate(paquete, 1):
+        for tipo, texto in (("CV", par['cv_texto']), ("OFERTA", par['job_texto'])):
+            if texto not in ids:
+                cuenta[tipo] += 1
+                ids[texto] = f"{tipo}{cuenta[tipo]}"
+                documentos.append(f"[{ids[texto]}]\n{texto}")
+        lineas.append(f"PAR {n}: {ids[par['cv_texto']]} vs {ids[par['job_texto']]}")
+    return PROMPT_LOTE.format(documentos="\n\n".join(documentos), pares="\n".join(lineas))
+
+
+def _evaluar_paquete(paquete, generar):
+    texto = generar(construir_prompt(paquete)).text
+    encontrados = {}
+    for m in _RE_FILA.finditer(texto):
+        encontrados[int(m.group(1))] = (min(int(m.group(2)), 100), m.group(3).strip())
+    resultados = []
+    for n, par in enumerate(paquete, 1):
+        if n in encontrados:
+            resultados.append((par, encontrados[n]))
+        elif len(paquete) > 1:  # La IA se saltó un par: se reintenta solo
+            resultados.extend(_evaluar_paquete([par], generar))
+        else:
+            resultados.append((par, None))
+    return resultados
+
+
+def _fila(par, resultado, error=""):
+    score, resumen = resultado if resultado else (None, "")
+    return {'CV': par['cv'], 'Oferta': par['oferta'], 'Score': score, 'Resumen': resumen,
+            'Error': error or ("" if resultado else "Sin respuesta")}
+
+
+def escanear_lote(cvs, ofertas, generar, cache=None, modelos="", max_concurrencia=4):
+    """Generador de filas {'CV', 'Oferta', 'Score', 'Resumen', 'Error'} en orden de llegada"""
+    textos_cv, textos_of = leer_entradas(cvs, ofertas)
+    pares, pendientes = [], []
+    for nombre, cv in textos_cv:
+        for etiqueta, job in textos_of:
+            par = {'cv': nombre, 'oferta': etiqueta, 'cv_texto': cv, 'job_texto': job}
+            if not cv or not job:
+                yield _fila(par, None, "No se pudo leer el documento")
+                continue
+            par['clave'] = CacheAnalisis.clave(cv, job, f"lote-{VERSION_PROMPT_LOTE}", modelos)
+            pares.append(par)
+
+    for par in pares:
+        guardado = cache.obtener(par['clave']) if cache else None
+        if guardado:
+            score, resumen = guardado.split("|", 1)
+            yield _fila(par, (int(score), resumen))
+        else:
+            pendientes.append(par)
+
+    with ThreadPoolExecutor(max_workers=max_concurrencia) as pool:
+        futuros = {pool.submit(_evaluar_paquete, p, generar): p for p in empaquetar(pendientes)}
+        for f in as_completed(futuros):
+            try:
+                resultados = f.result()
+            except Exception as e:
+                for par in futuros[f]: yield _fila(par, None, str(e))
+                continue
+            for par, resultado in resultados:
+                if resultado and cache: cache.guardar(par['clave'], f"{resultado[0]}|{resultado[1]}")
+                yield _fila(par, resultado)
+
+
+def filas_a_csv(filas):
+    buf = io.StringIO()
+    w = csv.DictWriter(buf, fieldnames=['CV', 'Oferta', 'Score', 'Resumen', 'Error'])
+    w.writeheader()
+    for fila in filas: w.writerow(fila)
+    return buf.getvalue().encode('utf-8-sig')  # BOM para que Excel respete los acentos
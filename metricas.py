@@ -0,0 +1,189 @@
+import contextvars
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- MÉTRICAS Y TRAZAS ---
+# Contadores e histogramas en memoria del proceso (un lock y unas sumas por
+# evento, se puede dejar prendido en producción), exportados como texto de
+# Prometheus por un http.server en un hilo aparte. Cada tramo (leer_doc,
+# leer_web, prompt, intento de modelo, pdf, tts...) suma su duración al
+# histograma y, si SCANMATCH_TRAZAS apunta a un archivo, queda como una
+# línea JSONL con el id de traza del escaneo. La escritura la hace un hilo
+# de fondo para no frenar al que mide.
+
+ARCHIVO_TRAZAS = os.getenv("SCANMATCH_TRAZAS", "")
+MUESTREO_TRAZAS = float(os.getenv("SCANMATCH_TRAZAS_MUESTREO", "1.0"))
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PREFIJO = "scanmatch_"
+
+_lock = threading.Lock()
+_contadores = {}  # (nombre, etiquetas) -> valor
+_histogramas = {}  # (nombre, etiquetas) -> [cuenta por bucket..., suma, total]
+_ayuda = {}  # nombre -> (tipo, descripción)
+
+_traza = contextvars.ContextVar("traza", default=None)  # (id, muestreada)
+_tramo_padre = contextvars.ContextVar("tramo_padre", default=None)
+
+
+def _etiquetas(etiquetas):
+    return tuple(sorted((k, str(v)) for k, v in etiquetas.items()))
+
+
+def contar(nombre, valor=1, ayuda="", **etiquetas):
+    clave = (nombre, _etiquetas(etiquetas))
+    with _lock:
+        _contadores[clave] = _contadores.get(clave, 0) + valor
+        if nombre not in _ayuda: _ayuda[nombre] = ("counter", ayuda)
+
+
+def observar(nombre, valor, ayuda="", **etiquetas):
+    clave = (nombre, _etiquetas(etiquetas))
+    with _lock:
+        h = _histogramas.get(clave)
+        if h is None:
+            h = _histogramas[clave] = [0] * (len(BUCKETS) + 2)
+            if nombre not in _ayuda: _ayuda[nombre] = ("histogram", ayuda)
+        for i, limite in enumerate(BUCKETS):
+            if valor <= limite: h[i] += 1
+        h[-2] += valor
+        h[-1] += 1
+
+
+def cache(nombre, acierto):
+    """Aciertos y fallos de cada cache (la tasa se calcula en Prometheus)"""
+    contar("cache_total", ayuda="Consultas a caches", cache=nombre, resultado="hit" if acierto else "miss")
+
+
+# --- TRAZAS ---
+def nueva_traza():
+    """Empieza una traza (un escaneo); los tramos siguientes en este contexto quedan ligados a ella"""
+    _traza.set((os.urandom(8).hex(), random.random() < MUESTREO_TRAZAS))
+    _tramo_padre.set(None)
+
+
+def en_contexto(funcion):
+    """Envuelve `funcion` para que corra en otro hilo con la traza actual"""
+    contexto = contextvars.copy_context()
+    return lambda *args, **kwargs: contexto.run(funcion, *args, **kwargs)
+
+
+@contextmanager
+def tramo(nombre, **etiquetas):
+    """Mide el bloque: histograma `tramo_segundos{tramo=...}` y, si hay archivo, una línea de traza.
+    Se pueden agregar etiquetas de traza durante el bloque escribiendo en el dict que devuelve."""
+    id_tramo = os.urandom(4).hex()
+    padre = _tramo_padre.set(id_tramo)
+    extra = {}
+    inicio, t0, error = time.time(), time.perf_counter(), None
+    try:
+        yield extra
+    except Exception as e:  # st.rerun()/st.stop() no son errores
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        duracion = time.perf_counter() - t0
+        _tramo_padre.reset(padre)
+        observar("tramo_segundos", duracion, ayuda="Duración de cada etapa", tramo=nombre, **etiquetas)
+        if error: contar("errores_total", ayuda="Errores por etapa", tramo=nombre, **etiquetas)
+        _escribir_traza(nombre, id_tramo, padre.old_value, inicio, duracion, error, {**etiquetas, **extra})
+
+
+# --- ARCHIVO JSONL ---
+_cola_trazas = queue.SimpleQueue()
+_escritor = None
+_escritor_lock = threading.Lock()
+
+
+def _escribir_traza(nombre, id_tramo, padre, inicio, duracion, error, etiquetas):
+    if not ARCHIVO_TRAZAS: return
+    traza = _traza.get()
+    if traza is None:
+        traza = (None, random.random() < MUESTREO_TRAZAS)
+    if not traza[1]: return
+    registro = {"traza": traza[0], "tramo": nombre, "id": id_tramo,
+                "padre": padre if padre is not contextvars.Token.MISSING else None,
+                "inicio": round(inicio, 3), "ms": round(duracion * 1000, 2), **etiquetas}
+    if error: registro["error"] = error
+    _arrancar_escritor()
+    _cola_trazas.put(registro)
+
+
+def _arrancar_escritor():
+    global _escritor
+    if _escritor is not None: return
+    with _escritor_lock:
+        if _escritor is None:
+            _escritor = threading.Thread(target=_escribir_en_archivo, name="trazas", daemon=True)
+            _escritor.start()
+
+
+def _escribir_en_archivo():
+    with open(ARCHIVO_TRAZAS, 'a', encoding='utf-8') as f:
+        while True:
+            f.write(json.dumps(_cola_trazas.get(), ensure_ascii=False, default=str) + "\n")
+            if _cola_trazas.empty(): f.flush()  # Se agrupan las líneas que llegan juntas
+
+
+# --- EXPORTACIÓN ---
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatear_etiquetas(etiquetas, extra=()):
+    pares = list(etiquetas) + list(extra)
+    if not pares: return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}"
+
+
+def exportar_prometheus():
+    """Texto en el formato de exposición de Prometheus"""
+    with _lock:
+        contadores = dict(_contadores)
+        histogramas = {k: list(v) for k, v in _histogramas.items()}
+        ayuda = dict(_ayuda)
+    lineas = []
+    for nombre, (tipo, descripcion) in sorted(ayuda.items()):
+        completo = PREFIJO + nombre
+        if descripcion: lineas.append(f"# HELP {completo} {descripcion}")
+        lineas.append(f"# TYPE {completo} {tipo}")
+        if tipo == "counter":
+            for (n, etiquetas), valor in sorted(contadores.items()):
+                if n == nombre: lineas.append(f"{completo}{_formatear_etiquetas(etiquetas)} {valor}")
+            continue
+        for (n, etiquetas), h in sorted(histogramas.items()):
+            if n != nombre: continue
+            for limite, cuenta in zip(BUCKETS, h):
+                lineas.append(f"{completo}_bucket{_formatear_etiquetas(etiquetas, [('le', limite)])} {cuenta}")
+            lineas.append(f"{completo}_bucket{_formatear_etiquetas(etiquetas, [('le', '+Inf')])} {h[-1]}")
+            lineas.append(f"{completo}_sum{_formatear_etiquetas(etiquetas)} {h[-2]}")
+            lineas.append(f"{completo}_count{_formatear_etiquetas(etiquetas)} {h[-1]}")
+    return "\n".join(lineas) + "\n"
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        cuerpo = exportar_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass  # Sin una línea en stderr por cada scrape
+
+
+def iniciar_servidor(puerto, host="0.0.0.0"):
+    """Sirve /metrics en un hilo daemon; devuelve el servidor"""
+    servidor = ThreadingHTTPServer((host, puerto), _Manejador)
+    threading.Thread(target=servidor.serve_forever, name="metricas", daemon=True).start()
+    return servidor
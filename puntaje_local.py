@@ -0,0 +1,226 @@
+import re
+import unicodedata
+
+# --- PUNTAJE LOCAL DE HABILIDADES ---
+# Las habilidades se comparan sin IA: se extraen de la oferta con un léxico
+# (sinónimos incluidos), se buscan en el CV y sale un score en milisegundos. El índice de n-gramas normalizados se arma una sola vez al
+# importar el módulo.
+
+# Subir al tocar el léxico: forma parte de la clave del cache de análisis
+VERSION_LEXICO = 3
+
+# canónico -> variantes normalizadas que lo delatan en un texto. Nada de
+# variantes que también sean palabras comunes ("líder", "rest", "comercial",
+# "excel", "organización", "innovación"): con ellas la oferta "pide"
+# habilidades que no pide (los beneficios y la presentación de la empresa
+# también son texto de la oferta); mejor con calificativo.
+HABILIDADES_DURAS = {
+    "Python": ["python", "python3"],
+    "Java": ["java"],
+    "JavaScript": ["javascript", "js", "ecmascript"],
+    "TypeScript": ["typescript"],
+    "C#": ["c#", "csharp", "c sharp"],
+    "C++": ["c++", "cpp"],
+    "Go": ["golang"],
+    "PHP": ["php"],
+    "Ruby": ["ruby", "ruby on rails", "rails"],
+    "Kotlin": ["kotlin"],
+    "Swift": ["swift"],
+    "R": ["lenguaje r", "r studio", "rstudio"],
+    "SQL": ["sql", "t-sql", "pl/sql", "plsql"],
+    "PostgreSQL": ["postgresql", "postgres"],
+    "MySQL": ["mysql"],
+    "MongoDB": ["mongodb", "mongo"],
+    "Redis": ["redis"],
+    "Oracle": ["oracle"],
+    "HTML": ["html", "html5"],
+    "CSS": ["css", "css3", "sass", "scss"],
+    "React": ["react", "reactjs", "react.js"],
+    "Angular": ["angular", "angularjs"],
+    "Vue": ["vue", "vuejs", "vue.js"],
+    "Node.js": ["node", "nodejs", "node.js"],
+    "Django": ["django"],
+    "Flask": ["flask"],
+    "FastAPI": ["fastapi"],
+    "Spring": ["spring boot", "springboot", "spring framework", "spring mvc", "spring security", "spring data",
+               "spring cloud"],
+    ".NET": ["dotnet", "asp.net", "vb.net", "net core", "net framework"],
+    "APIs REST": ["api rest", "apis rest", "restful", "rest api", "rest apis", "servicios rest"],
+    "GraphQL": ["graphql"],
+    "Microservicios": ["microservicios", "microservices"],
+    "Docker": ["docker", "docker compose"],
+    "Kubernetes": ["kubernetes", "k8s"],
+    "AWS": ["aws", "amazon web services"],
+    "Azure": ["azure"],
+    "GCP": ["gcp", "google cloud"],
+    "Terraform": ["terraform"],
+    "CI/CD": ["ci/cd", "integracion continua", "continuous integration", "jenkins", "github actions", "gitlab ci"],
+    "Git": ["git", "github", "gitlab", "control de versiones"],
+    "Linux": ["linux", "unix", "bash"],
+    "Testing": ["testing", "pruebas unitarias", "unit testing", "pytest", "junit", "tdd"],
+    "Machine Learning": ["machine learning", "aprendizaje automatico", "ml"],
+    "Deep Learning": ["deep learning", "aprendizaje profundo", "redes neuronales", "neural networks"],
+    "Data Science": ["data science", "ciencia de datos"],
+    "Pandas": ["pandas"],
+    "NumPy": ["numpy"],
+    "TensorFlow": ["tensorflow"],
+    "PyTorch": ["pytorch"],
+    "Scikit-learn": ["scikit-learn", "sklearn"],
+    "NLP": ["nlp", "procesamiento de lenguaje natural", "natural language processing"],
+    "Estadística": ["estadistica", "statistics", "estadisticas"],
+    "ETL": ["etl", "pipelines de datos", "data pipelines"],
+    "Spark": ["spark", "pyspark"],
+    "Big Data": ["big data", "hadoop"],
+    "Power BI": ["power bi", "powerbi"],
+    "Tableau": ["tableau"],
+    "Excel": ["microsoft excel", "ms excel", "excel avanzado", "excel intermedio", "advanced excel", "manejo de excel",
+              "dominio de excel", "tablas dinamicas", "pivot tables", "buscarv", "vlookup", "hojas de calculo",
+              "spreadsheets"],
+    "SAP": ["sap erp", "sap hana", "sap s/4hana", "sap fico", "sap mm", "sap sd", "abap"],
+    "Salesforce": ["salesforce"],
+    "CRM": ["crm", "hubspot"],
+    "Jira": ["jira"],
+    "Scrum": ["scrum", "sprint"],
+    "Agile": ["agile", "agil", "metodologias agiles", "kanban"],
+    "Gestión de proyectos": ["gestion de proyectos", "project management", "pmp", "project manager"],
+    "UX/UI": ["ux", "ui", "ux/ui", "experiencia de usuario", "user experience"],
+    "Figma": ["figma"],
+    "Photoshop": ["photoshop", "adobe photoshop"],
+    "Marketing digital": ["marketing digital", "digital marketing"],
+    "SEO": ["seo", "posicionamiento web"],
+    "SEM": ["google ads", "search engine marketing", "campanas sem", "posicionamiento de pago"],
+    "Redes sociales": ["redes sociales", "social media", "community manager"],
+    "Google Analytics": ["google analytics", "analitica web", "web analytics"],
+    "Contabilidad": ["contabilidad", "accounting", "contable"],
+    "Finanzas": ["finanzas", "finance", "financiero", "analisis financiero"],
+    "Ventas": ["ventas", "sales", "ejecutivo comercial", "asesor comercial", "gestion comercial"],
+    "Atención al cliente": ["atencion al cliente", "servicio al cliente", "customer service"],
+    "Recursos humanos": ["recursos humanos", "rrhh", "human resources", "reclutamiento", "seleccion de personal"],
+    "Logística": ["logistica", "logistics", "cadena de suministro", "supply chain"],
+    "Ciberseguridad": ["ciberseguridad", "seguridad informatica", "cybersecurity", "infosec"],
+    "Redes": ["redes informaticas", "networking", "tcp/ip", "cisco"],
+    "Inglés": ["ingles", "english"],
+    "Portugués": ["portugues", "portuguese"],
+    "Francés": ["frances", "french"],
+    "Alemán": ["aleman", "german"],
+}
+
+HABILIDADES_BLANDAS = {
+    "Comunicación": ["comunicacion", "communication", "comunicacion efectiva", "habilidades comunicativas"],
+    "Trabajo en equipo": ["trabajo en equipo", "teamwork", "colaboracion", "collaboration"],
+    "Liderazgo": ["liderazgo", "leadership", "liderar equipos", "lider de equipo", "team lead"],
+    "Resolución de problemas": ["resolucion de problemas", "problem solving", "solucion de problemas"],
+    "Pensamiento crítico": ["pensamiento critico", "critical thinking", "pensamiento analitico", "analytical thinking"],
+    "Adaptabilidad": ["adaptabilidad", "adaptability", "capacidad de adaptacion", "adaptacion al cambio"],
+    "Proactividad": ["proactividad", "proactivo", "proactive", "iniciativa propia", "tomar la iniciativa"],
+    "Organización": ["capacidad de organizacion", "habilidades organizativas", "organizational skills", "organizado",
+                     "gestion del tiempo", "time management"],
+    "Negociación": ["negociacion", "negotiation"],
+    "Creatividad": ["creatividad", "creativity", "creativo"],
+    "Orientación a resultados": ["orientacion a resultados", "results oriented", "orientado a resultados"],
+    "Empatía": ["empatia", "empathy"],
+    "Autonomía": ["autonomia", "autonomo", "autonomy", "autogestion"],
+    "Atención al detalle": ["atencion al detalle", "attention to detail", "detallista"],
+}
+
+PESO_DURAS = 1.0
+PESO_BLANDAS = 0.5
+
+_SUFIJOS = sorted(["aciones", "acion", "mente", "idades", "idad", "ismos", "ismo", "istas", "ista",
+                   "ivos", "ivas", "ivo", "iva", "ing", "ers", "er", "es", "s"], key=len, reverse=True)
+_RE_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#./-]*[a-z0-9+#]|[a-z0-9+#]")
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize("NFKD", (texto or "").lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def raiz(token):
+    """Stemming liviano español/inglés; los tokens cortos o técnicos quedan igual"""
+    if len(token) <= 4 or not token.isalpha():
+        return token
+    for sufijo in _SUFIJOS:
+        if token.endswith(sufijo) and len(token) - len(sufijo) >= 4:
+            return token[:-len(sufijo)]
+    return token
+
+
+def tokenizar(texto):
+    return [raiz(t.rstrip(".")) for t in _RE_TOKEN.findall(normalizar(texto))]
+
+
+def _construir_indice():
+    indice, max_n = {}, 1
+    for tipo, lexico in (("duras", HABILIDADES_DURAS), ("blandas", HABILIDADES_BLANDAS)):
+        for canonico, variantes in lexico.items():
+            for v in variantes:
+                tokens = tuple(tokenizar(v))
+                if tokens:
+                    indice[tokens] = (tipo, canonico)
+                    max_n = max(max_n, len(tokens))
+    return indice, max_n
+
+
+_INDICE, _MAX_N = _construir_indice()
+
+
+def extraer_habilidades(texto):
+    """{'duras': set(canónicos), 'blandas': set(canónicos)} presentes en el texto"""
+    tokens = tokenizar(texto)
+    encontradas = {"duras": set(), "blandas": set()}
+    for i in range(len(tokens)):
+        for n in range(min(_MAX_N, len(tokens) - i), 0, -1):
+            hit = _INDICE.get(tuple(tokens[i:i + n]))
+            if hit:
+                encontradas[hit[0]].add(hit[1])
+                break
+    return encontradas
+
+
+def puntuar(cv, job):
+    """Score 0-100 y listas de presentes/faltantes de las habilidades que pide la oferta"""
+    pedidas, en_cv = extraer_habilidades(job), extraer_habilidades(cv)
+    resultado, total, logrado = {}, 0.0, 0.0
+    for tipo, peso in (("duras", PESO_DURAS), ("blandas", PESO_BLANDAS)):
+        presentes = sorted(pedidas[tipo] & en_cv[tipo])
+        faltantes = sorted(pedidas[tipo] - en_cv[tipo])
+        resultado[tipo] = {"presentes": presentes, "faltantes": faltantes}
+        total += peso * len(pedidas[tipo])
+        logrado += peso * len(presentes)
+    # Sin habilidades reconocibles en la oferta no hay base para puntuar
+    resultado["score"] = round(100 * logrado / total) if total else None
+    return resultado
+
+
+def resumen_rapido(resultado):
+    """Resumen para el escaneo rápido, cuando no se llama a la IA"""
+    if resultado["score"] is None:
+        return "No se reconocieron habilidades del léxico en la oferta; usa el escaneo completo."
+    pedidas = sum(len(resultado[t]["presentes"]) + len(resultado[t]["faltantes"]) for t in ("duras", "blandas"))
+    cubiertas = sum(len(resultado[t]["presentes"]) for t in ("duras", "blandas"))
+    return f"Escaneo rápido (sin IA): el CV cubre {cubiertas} de {pedidas} habilidades que pide la oferta."
+
+
+if __name__ == "__main__":
+    # python puntaje_local.py: frases comunes que no deben leerse como habilidades
+    SIN_HABILIDADES = ["Empresa líder del sector", "the rest of the team", "net salary and benefits",
+                       "área comercial y nombre comercial", "ts 2024", "1er sem del año", "contenedores de carga",
+                       "sap de la planta", "Ofrecemos flexibilidad horaria", "una organización líder",
+                       "innovacion constante", "con iniciativa de la empresa", "You will excel in",
+                       "spring 2025 intake"]
+    for frase in SIN_HABILIDADES:
+        encontradas = extraer_habilidades(frase)
+        assert not (encontradas["duras"] or encontradas["blandas"]), (frase, encontradas)
+    CON_HABILIDADES = {"Liderazgo de equipos técnicos": "Liderazgo", "Diseño de API REST": "APIs REST",
+                       "Experiencia en ASP.NET y .NET Core": ".NET", "Gestión de CRM": "CRM",
+                       "Campañas SEM y SEO": "SEM", "Consultor SAP FICO": "SAP", "Docker Compose": "Docker",
+                       "Excel avanzado y tablas dinámicas": "Excel", "APIs con Spring Boot": "Spring",
+                       "Capacidad de organización": "Organización", "Capacidad de adaptación al cambio": "Adaptabilidad"}
+    for frase, canonico in CON_HABILIDADES.items():
+        encontradas = extraer_habilidades(frase)
+        assert canonico in encontradas["duras"] | encontradas["blandas"], (frase, encontradas)
+    assert puntuar("Desarrollador Python con Django", "Empresa líder del sector busca programador Python")["score"] == 100
+    assert puntuar("Desarrollador Python, Django", "Buscamos Python. Ofrecemos flexibilidad horaria en una organización "
+                   "líder e innovacion constante")["score"] == 100
+    print("Léxico OK")
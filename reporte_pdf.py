@@ -0,0 +1,223 @@
+import copy
+import hashlib
+import io
+import json
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import lru_cache
+
+from fpdf import FPDF
+from fpdf.fonts import SubsetMap
+
+import metricas
+
+# --- REPORTE PDF ---
+# Se arma desde el Analisis ya parseado, con una fuente TTF Unicode (fpdf2
+# incrusta solo el subconjunto de glifos usados) para no perder tildes ni
+# texto no latino. La fuente se busca y se parsea una sola vez por proceso
+# (cada documento se lleva una copia con su propio subconjunto) y los bytes
+# se guardan por hash del análisis: volver a descargar, o descargar después
+# de un reset, no vuelve a renderizar. Un semáforo limita los renders
+# simultáneos y dos pedidos del mismo reporte esperan al mismo render, así
+# la memoria no crece con la cantidad de descargas a la vez.
+
+MAX_BYTES_CACHE = 64 * 1024 * 1024
+MAX_RENDERS = 2
+
+# Primera que exista; SCANMATCH_FUENTE_TTF tiene prioridad
+FUENTES_TTF = [
+    ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"),
+    ("/usr/share/fonts/dejavu/DejaVuSans.ttf", "/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf"),
+    ("/usr/share/fonts/TTF/DejaVuSans.ttf", "/usr/share/fonts/TTF/DejaVuSans-Bold.ttf"),
+    ("/Library/Fonts/Arial Unicode.ttf", None),
+    ("C:\\Windows\\Fonts\\arial.ttf", "C:\\Windows\\Fonts\\arialbd.ttf"),
+]
+
+ETIQUETAS_ATS = {"ok": "OK", "mejorar": "Mejorar", "falta": "Falta"}
+
+
+@lru_cache(maxsize=1)
+def buscar_fuente():
+    """(ruta normal, ruta negrita o None), o None si no hay TTF: se usa Helvetica"""
+    propia = os.getenv("SCANMATCH_FUENTE_TTF")
+    candidatas = ([(propia, os.getenv("SCANMATCH_FUENTE_TTF_BOLD"))] if propia else []) + FUENTES_TTF
+    for normal, negrita in candidatas:
+        if os.path.isfile(normal):
+            return normal, (negrita if negrita and os.path.isfile(negrita) else None)
+    return None
+
+
+@lru_cache(maxsize=1)
+def fuentes_base():
+    """{fontkey: (TTFFont parseada, bytes del archivo)}, o None sin TTF o si este fpdf2 no deja copiarlas"""
+    fuente = buscar_fuente()
+    if not fuente: return None
+    normal, negrita = fuente
+    base = FPDF()
+    base.add_font("ScanMatch", "", normal)
+    base.add_font("ScanMatch", "B", negrita or normal)
+    fuentes = {}
+    for clave, f in base.fonts.items():
+        with open(f.ttffile, 'rb') as archivo: fuentes[clave] = (f, archivo.read())
+    try:
+        # copiar_fuente usa piezas internas de fpdf2 (probado con 2.8): si cambiaron, se parsea por documento
+        for f, datos in fuentes.values(): copiar_fuente(f, datos, 1)
+    except Exception as e:
+        metricas.contar("pdf_fuentes_sin_copia_total", ayuda="Procesos que parsean la fuente en cada PDF",
+                        motivo=type(e).__name__)
+        return None
+    return fuentes
+
+
+def copiar_fuente(fuente, datos, indice):
+    """Comparte métricas y cmap ya parseados; el TTFont y el subconjunto son del documento"""
+    from fontTools import ttLib  # Viene con fpdf2
+    copia = copy.copy(fuente)
+    copia.i = indice
+    # Al generar el PDF fpdf2 recorta el TTFont en el lugar: uno nuevo (lazy, casi gratis) por documento
+    copia.ttfont = ttLib.TTFont(io.BytesIO(datos), recalcTimestamp=False, lazy=True)
+    copia.subset = SubsetMap(copia)
+    copia.missing_glyphs, copia.biggest_size_pt, copia._hbfont = [], 0, None
+    return copia
+
+
+class PDFJobScan(FPDF):
+    def __init__(self):
+        super().__init__()
+        fuente = buscar_fuente()
+        if fuente:
+            fuentes = fuentes_base()
+            if fuentes:
+                for clave, (f, datos) in fuentes.items():
+                    self.fonts[clave] = copiar_fuente(f, datos, len(self.fonts) + 1)
+            else:
+                normal, negrita = fuente
+                self.add_font("ScanMatch", "", normal)
+                self.add_font("ScanMatch", "B", negrita or normal)
+            self.familia = "ScanMatch"
+        else:
+            self.familia = "Helvetica"
+        self.set_auto_page_break(True, margin=15)
+
+    def texto(self, texto):
+        # Helvetica solo conoce latin-1
+        if self.familia == "Helvetica": return texto.encode('latin-1', 'replace').decode('latin-1')
+        return texto
+
+    def header(self):
+        self.set_font(self.familia, 'B', 20)
+        self.set_text_color(0, 79, 159)
+        self.cell(0, 10, 'SCANMATCH REPORT', align='C', new_x="LMARGIN", new_y="NEXT")
+        self.ln(5)
+
+    def section_title(self, label):
+        self.set_font(self.familia, 'B', 12)
+        self.set_fill_color(240, 240, 240)
+        self.set_text_color(0, 0, 0)
+        self.cell(0, 8, self.texto(label), fill=True, new_x="LMARGIN", new_y="NEXT")
+        self.ln(2)
+
+    def body_text(self, text, negrita=False):
+        self.set_font(self.familia, 'B' if negrita else '', 10)
+        self.multi_cell(0, 5, self.texto(text), new_x="LMARGIN", new_y="NEXT")
+        self.ln(1)
+
+
+def renderizar(analisis, titulo=None):
+    """Bytes del PDF armado sección por sección desde el Analisis"""
+    def lista(items): return ", ".join(items) if items else "-"
+    pdf = PDFJobScan()
+    pdf.add_page()
+    if titulo: pdf.body_text(titulo, negrita=True)
+    if analisis.score is not None:
+        pdf.set_font(pdf.familia, 'B', 16)
+        pdf.cell(0, 10, f"Match Rate: {analisis.score}%", new_x="LMARGIN", new_y="NEXT")
+        pdf.ln(2)
+    if analisis.resumen:
+        pdf.section_title("Resumen")
+        pdf.body_text(analisis.resumen)
+    habilidades = (("Duras", analisis.duras), ("Blandas", analisis.blandas))
+    if any(h.presentes or h.faltantes for _, h in habilidades):  # Los reportes del lote no las traen
+        pdf.section_title("Habilidades")
+        for nombre, h in habilidades:
+            pdf.body_text(f"{nombre} presentes: {lista(h.presentes)}")
+            pdf.body_text(f"{nombre} faltantes: {lista(h.faltantes)}")
+    if analisis.chequeo_ats:
+        pdf.section_title("Chequeo ATS")
+        for c in analisis.chequeo_ats:
+            pdf.body_text(f"[{ETIQUETAS_ATS.get(c.estado, c.estado)}] {c.aspecto}", negrita=True)
+            if c.detalle: pdf.body_text(c.detalle)
+    if analisis.consejos:
+        pdf.section_title("Consejos")
+        for i, consejo in enumerate(analisis.consejos, 1): pdf.body_text(f"{i}. {consejo}")
+    return bytes(pdf.output())
+
+
+def huella(analisis, titulo=None):
+    datos = json.dumps([analisis.a_dict(), titulo], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(datos.encode('utf-8')).hexdigest()
+
+
+class RenderizadorPDF:
+    def __init__(self, max_bytes=MAX_BYTES_CACHE, max_renders=MAX_RENDERS):
+        self.max_bytes = max_bytes
+        self._cache = OrderedDict()  # huella -> bytes
+        self._bytes = 0
+        self._en_curso = {}  # huella -> Future del render que ya está corriendo
+        self._lock = threading.Lock()
+        self._cupos = threading.BoundedSemaphore(max_renders)
+
+    def pdf(self, analisis, titulo=None):
+        clave = huella(analisis, titulo)
+        with self._lock:
+            if clave in self._cache:
+                self._cache.move_to_end(clave)
+                metricas.cache("pdf", True)
+                return self._cache[clave]
+            futuro = self._en_curso.get(clave)
+            propio = futuro is None
+            if propio:
+                futuro = self._en_curso[clave] = Future()
+        metricas.cache("pdf", False)
+        if not propio:
+            return futuro.result()
+        try:
+            with self._cupos, metricas.tramo("pdf"):
+                datos = renderizar(analisis, titulo)
+            self._guardar(clave, datos)
+            futuro.set_result(datos)
+            return datos
+        except Exception as e:
+            futuro.set_exception(e)
+            raise
+        finally:
+            with self._lock: self._en_curso.pop(clave, None)
+
+    def _guardar(self, clave, datos):
+        with self._lock:
+            self._cache[clave] = datos
+            self._bytes += len(datos)
+            while self._bytes > self.max_bytes and len(self._cache) > 1:
+                _, viejo = self._cache.popitem(last=False)
+                self._bytes -= len(viejo)
+
+    def zip_reportes(self, reportes):
+        """Un zip con un PDF por (nombre, analisis, titulo)"""
+        buf = io.BytesIO()
+        # Los PDF ya vienen comprimidos: se guardan tal cual
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_STORED) as z:
+            usados = set()
+            for nombre, analisis, titulo in reportes:
+                base, n = nombre, 2
+                while nombre in usados:
+                    nombre, n = f"{base} ({n})", n + 1
+                usados.add(nombre)
+                z.writestr(f"{nombre}.pdf", self.pdf(analisis, titulo))
+        return buf.getvalue()
+
+    def stats(self):
+        with self._lock:
+            return {'entradas': len(self._cache), 'bytes': self._bytes}
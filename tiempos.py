@@ -0,0 +1,37 @@
+import threading
+import time
+from collections import deque
+
+# --- TIEMPOS DE ARRANQUE Y RERUN ---
+# La primera ejecución del script en el proceso es el arranque en frío
+# (importaciones + inicialización); las siguientes son reruns por clics.
+# Se guardan los últimos reruns para ver la mediana y el p95 en el sidebar.
+
+MAX_RERUNS = 200
+
+
+class RegistroTiempos:
+    def __init__(self, max_reruns=MAX_RERUNS):
+        self.inicio_proceso = time.time()
+        self.arranque = None  # (total, importaciones) del primer run completo
+        self._reruns = deque(maxlen=max_reruns)
+        self._lock = threading.Lock()
+
+    def registrar(self, total, importaciones):
+        with self._lock:
+            if self.arranque is None:
+                self.arranque = (total, importaciones)
+            else:
+                self._reruns.append(total)
+
+    def resumen(self):
+        with self._lock:
+            reruns = sorted(self._reruns)
+            arranque = self.arranque
+        datos = {'arranque_ms': round(arranque[0] * 1000) if arranque else None,
+                 'importaciones_ms': round(arranque[1] * 1000) if arranque else None,
+                 'reruns': len(reruns), 'p50_ms': None, 'p95_ms': None}
+        if reruns:
+            datos['p50_ms'] = round(reruns[len(reruns) // 2] * 1000)
+            datos['p95_ms'] = round(reruns[min(len(reruns) - 1, int(len(reruns) * 0.95))] * 1000)
+        return datos
@@ -0,0 +1,163 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import metricas
+from base_datos import obtener_pool, RUTA_DB
+from limitador import ColaLlena
+
+# --- COLA DE ESCANEOS EN SEGUNDO PLANO ---
+# El escaneo ya no corre dentro del clic: queda como trabajo en usuarios.db
+# (pendiente -> corriendo -> listo | error) y lo toma un pool de hilos de
+# tamaño fijo por proceso, así los escaneos simultáneos no crecen con las
+# pestañas abiertas. La UI solo sondea la fila: un rerun o una reconexión no
+# pierde ni repite la consulta, y el mismo usuario enviando el mismo CV y
+# oferta vuelve al trabajo que ya existe. El texto que llega por streaming se
+# guarda de a ratos para mostrarlo mientras tanto. Los lotes van por la misma
+# cola (tipo 'lote'). El tope de llamadas a la IA es un semáforo del proceso
+# (cupos_ia) que toma cada llamada, sea de un escaneo o de un paquete de lote:
+# un lote reparte sus paquetes en los cupos que estén libres.
+
+PENDIENTE, CORRIENDO, LISTO, ERROR = 'pendiente', 'corriendo', 'listo', 'error'
+ESCANEO, LOTE = 'escaneo', 'lote'
+
+TTL_DEDUPLICADO = 600  # Un trabajo terminado se devuelve igual ante el mismo envío durante este tiempo
+LATIDO = 15  # Cada cuánto se marcan como vivos los trabajos en curso
+LATIDO_VENCIDO = 120  # Sin latido por esto, el proceso que lo corría murió
+INTERVALO_PARCIAL = 0.5  # Mínimo entre escrituras del texto parcial
+RETENCION = 7 * 24 * 3600
+
+
+def _comprimir(texto):
+    return zlib.compress(texto.encode('utf-8'))
+
+
+def _descomprimir(blob):
+    return zlib.decompress(blob).decode('utf-8')
+
+
+class ColaTrabajos:
+    def __init__(self, ejecutores, hilos, max_pendientes, ruta=RUTA_DB):
+        """ejecutores: {tipo: ejecutar(entrada, avance)} que devuelve un dict; avance(texto) guarda el parcial"""
+        self.ejecutores = ejecutores
+        self.hilos = hilos
+        self.max_pendientes = max_pendientes
+        self.cupos_ia = threading.BoundedSemaphore(hilos)
+        self._pool = obtener_pool(ruta)
+        self._hilos = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="escaneo")
+        self._en_curso = set()
+        self._lock = threading.Lock()
+        self._init_tabla()
+        self._recuperar()
+        threading.Thread(target=self._latir, name="latido_trabajos", daemon=True).start()
+
+    def _init_tabla(self):
+        with self._pool.conexion() as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS trabajos_escaneo (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            username TEXT NOT NULL, clave TEXT NOT NULL, titulo TEXT, tipo TEXT NOT NULL,
+                            estado TEXT NOT NULL, creado REAL NOT NULL, actualizado REAL NOT NULL,
+                            entrada BLOB, parcial TEXT, resultado TEXT, error TEXT)''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_trab_clave ON trabajos_escaneo (username, clave, creado DESC)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_trab_estado ON trabajos_escaneo (estado, creado)')
+
+    def _recuperar(self):
+        """Lo que quedó corriendo en un proceso muerto vuelve a pendiente, y se retoma lo pendiente"""
+        ahora = time.time()
+        with self._pool.conexion() as conn:
+            conn.execute('UPDATE trabajos_escaneo SET estado = ? WHERE estado = ? AND actualizado < ?',
+                         (PENDIENTE, CORRIENDO, ahora - LATIDO_VENCIDO))
+            conn.execute('DELETE FROM trabajos_escaneo WHERE estado IN (?, ?) AND actualizado < ?',
+                         (LISTO, ERROR, ahora - RETENCION))
+            pendientes = [f[0] for f in conn.execute('SELECT id FROM trabajos_escaneo WHERE estado = ? ORDER BY creado',
+                                                     (PENDIENTE,))]
+        # Si otro proceso vivo también los tiene encolados, el UPDATE de _correr decide quién lo corre
+        for id_trabajo in pendientes: self._hilos.submit(self._correr, id_trabajo)
+
+    def enviar(self, username, clave, entrada, titulo="", tipo=ESCANEO):
+        """Id del trabajo: uno nuevo, o el que ya existe para la misma entrada del usuario"""
+        ahora = time.time()
+        with self._pool.conexion() as conn:
+            conn.execute('BEGIN IMMEDIATE')  # Dos pestañas enviando a la vez encuentran la misma fila
+            fila = conn.execute('SELECT id FROM trabajos_escaneo WHERE username = ? AND clave = ? '
+                                'AND (estado IN (?, ?) OR (estado = ? AND actualizado > ?)) ORDER BY creado DESC LIMIT 1',
+                                (username, clave, PENDIENTE, CORRIENDO, LISTO, ahora - TTL_DEDUPLICADO)).fetchone()
+            if fila:
+                metricas.contar("trabajos_total", ayuda="Escaneos enviados a la cola", resultado="duplicado")
+                return fila[0]
+            pendientes = conn.execute('SELECT COUNT(*) FROM trabajos_escaneo WHERE estado = ?', (PENDIENTE,)).fetchone()[0]
+            if pendientes >= self.max_pendientes:
+                raise ColaLlena(f"Hay {pendientes} escaneos en espera")
+            id_trabajo = conn.execute('INSERT INTO trabajos_escaneo (username, clave, titulo, tipo, estado, creado, actualizado, entrada) '
+                                      'VALUES (?,?,?,?,?,?,?,?)', (username, clave, titulo, tipo, PENDIENTE, ahora, ahora,
+                                                                   _comprimir(json.dumps(entrada, ensure_ascii=False)))).lastrowid
+        metricas.contar("trabajos_total", ayuda="Escaneos enviados a la cola", resultado="nuevo")
+        self._hilos.submit(self._correr, id_trabajo)
+        return id_trabajo
+
+    def _correr(self, id_trabajo):
+        with self._pool.conexion() as conn:
+            tomado = conn.execute('UPDATE trabajos_escaneo SET estado = ?, actualizado = ? WHERE id = ? AND estado = ?',
+                                  (CORRIENDO, time.time(), id_trabajo, PENDIENTE)).rowcount
+            fila = conn.execute('SELECT entrada, creado, tipo FROM trabajos_escaneo WHERE id = ?', (id_trabajo,)).fetchone()
+        if not tomado or not fila: return  # Ya lo tomó otro proceso
+        metricas.observar("trabajo_espera_segundos", time.time() - fila[1], ayuda="Tiempo en cola de cada escaneo")
+        with self._lock: self._en_curso.add(id_trabajo)
+        try:
+            resultado = self.ejecutores[fila[2]](json.loads(_descomprimir(fila[0])), self._avance(id_trabajo))
+            estado, resultado, error = LISTO, json.dumps(resultado, ensure_ascii=False), None
+        except Exception as e:
+            estado, resultado, error = ERROR, None, str(e)
+        finally:
+            with self._lock: self._en_curso.discard(id_trabajo)
+        # La entrada (CV y oferta) ya no hace falta: el escaneo terminado vive en el historial
+        with self._pool.conexion() as conn:
+            conn.execute('UPDATE trabajos_escaneo SET estado = ?, actualizado = ?, resultado = ?, error = ?, '
+                         'entrada = NULL, parcial = NULL WHERE id = ?', (estado, time.time(), resultado, error, id_trabajo))
+        metricas.contar("trabajos_terminados_total", ayuda="Escaneos de la cola terminados", estado=estado)
+
+    def _avance(self, id_trabajo):
+        ultimo = [0.0]
+
+        def avance(texto):
+            ahora = time.monotonic()
+            if ahora - ultimo[0] < INTERVALO_PARCIAL: return
+            ultimo[0] = ahora
+            with self._pool.conexion() as conn:
+                conn.execute('UPDATE trabajos_escaneo SET parcial = ?, actualizado = ? WHERE id = ?',
+                             (texto, time.time(), id_trabajo))
+        return avance
+
+    def _latir(self):
+        while True:
+            time.sleep(LATIDO)
+            with self._lock: ids = list(self._en_curso)
+            if not ids: continue
+            try:
+                with self._pool.conexion() as conn:
+                    conn.executemany('UPDATE trabajos_escaneo SET actualizado = ? WHERE id = ?',
+                                     [(time.time(), i) for i in ids])
+            except sqlite3.Error:
+                pass  # Se reintenta en el próximo latido
+
+    def consultar(self, username, id_trabajo):
+        """{'estado', 'posicion', 'parcial', 'resultado', 'error'} o None si no es del usuario"""
+        with self._pool.conexion() as conn:
+            fila = conn.execute('SELECT estado, creado, parcial, resultado, error FROM trabajos_escaneo '
+                                'WHERE id = ? AND username = ?', (id_trabajo, username)).fetchone()
+            if not fila: return None
+            posicion = 0
+            if fila[0] == PENDIENTE:
+                posicion = conn.execute('SELECT COUNT(*) FROM trabajos_escaneo WHERE estado = ? AND creado <= ?',
+                                        (PENDIENTE, fila[1])).fetchone()[0]
+        return {'estado': fila[0], 'posicion': posicion, 'parcial': fila[2] or "",
+                'resultado': json.loads(fila[3]) if fila[3] else None, 'error': fila[4]}
+
+    def activos(self, username, tipo=ESCANEO):
+        """Trabajos del usuario de ese tipo que todavía no terminaron: id, creado, estado, titulo"""
+        with self._pool.conexion() as conn:
+            return conn.execute('SELECT id, creado, estado, titulo FROM trabajos_escaneo WHERE username = ? AND tipo = ? '
+                                'AND estado IN (?, ?) ORDER BY creado', (username, tipo, PENDIENTE, CORRIENDO)).fetchall()
@@ -0,0 +1,166 @@
+import importlib.util
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metricas
+
+# --- DESCARGA DE OFERTAS WEB ---
+# Una sola Session con pool de conexiones para todo el proceso, cache por URL
+# con revalidación ETag/Last-Modified y tope de bytes descargados. BeautifulSoup
+# (y lxml) se cargan recién con la primera página a parsear.
+
+USER_AGENT = 'Mozilla/5.0'
+TIMEOUT = 5
+MAX_BYTES = 2 * 1024 * 1024
+FRESCURA_SEGUNDOS = 300  # Dentro de esta ventana ni siquiera se revalida
+MAX_CACHE = 256
+
+
+@lru_cache(maxsize=1)
+def _sopa():
+    """(BeautifulSoup, parser): lxml si está instalado"""
+    from bs4 import BeautifulSoup
+    return BeautifulSoup, 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+
+
+_session = requests.Session()
+_session.headers.update({'User-Agent': USER_AGENT})
+_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32)
+_session.mount('http://', _adapter)
+_session.mount('https://', _adapter)
+
+_cache = OrderedDict()  # url -> {'texto', 'etag', 'last_modified', 'ts'}
+_cache_lock = threading.Lock()
+
+SELECTORES_OFERTA = [
+    '[itemtype*="JobPosting"]',
+    '[class*="job-description"]', '[id*="job-description"]',
+    '[class*="jobDescription"]', '[id*="jobDescription"]',
+    '[class*="description"]',
+    'article', 'main', '[role="main"]',
+]
+RUIDO = ["script", "style", "nav", "footer", "header", "aside", "form", "noscript", "svg", "iframe"]
+MIN_CARACTERES_OFERTA = 200
+
+# Avisos de la página que no son la oferta (cookies, login, compartir): se
+# quitan los nodos por su id/clase, no las líneas que nombran esas palabras
+# ("Implement login and SSO flows" es un requisito)
+AVISOS = ", ".join(f'[{a}*="{v}" i]' for a in ("id", "class") for v in
+                   ("cookie", "consent", "gdpr", "newsletter", "login", "signin", "sign-in", "signup", "sign-up",
+                    "social-share", "share-button", "sharing"))
+AVISOS += ', [aria-modal="true"]'
+MAX_CARACTERES_AVISO = 1000  # Más que esto (o más de media página) es un contenedor, no un aviso
+# Botones y enlaces sueltos que quedan como línea propia en el texto
+_RE_LINEA_AVISO = re.compile(
+    r"(inicia(r)? sesi[oó]n|sign in|log in|login|reg[ií]strate|sign up|suscr[ií]bete|subscribe|"
+    r"aceptar( todas( las)?)? cookies|accept( all)? cookies|compartir( en \w+)?|share( on \w+)?|"
+    r"s[ií]guenos( en \w+)?|todos los derechos reservados|all rights reserved|©.*)[.!]?", re.I)
+
+
+def _descargar(url, cabeceras):
+    """GET en streaming que corta al superar MAX_BYTES"""
+    r = _session.get(url, headers=cabeceras, timeout=TIMEOUT, stream=True)
+    try:
+        if r.status_code == 304:
+            return r, None
+        r.raise_for_status()
+        partes, total = [], 0
+        for bloque in r.iter_content(chunk_size=64 * 1024):
+            partes.append(bloque)
+            total += len(bloque)
+            if total >= MAX_BYTES: break
+        metricas.contar("bytes_descargados_total", total, ayuda="Bytes de ofertas web descargados")
+        cuerpo = b"".join(partes)[:MAX_BYTES]
+        return r, cuerpo.decode(r.encoding or 'utf-8', errors='replace')
+    finally:
+        r.close()
+
+
+def _oferta_json_ld(html):
+    """Las webs de empleo suelen publicar la oferta como JobPosting en JSON-LD"""
+    for bloque in re.findall(r'<script[^>]+application/ld\+json[^>]*>(.*?)</script>', html, flags=re.S | re.I):
+        try:
+            datos = json.loads(bloque.strip())
+        except ValueError:
+            continue
+        if not isinstance(datos, (list, dict)): continue
+        candidatos = datos if isinstance(datos, list) else datos.get('@graph', [datos])
+        for d in candidatos:
+            if isinstance(d, dict) and d.get('@type') == 'JobPosting' and d.get('description'):
+                titulo = d.get('title', '')
+                BeautifulSoup, parser = _sopa()
+                desc = BeautifulSoup(d['description'], parser).get_text(separator='\n', strip=True)
+                return f"{titulo}\n{desc}".strip()
+    return ""
+
+
+def extraer_oferta(html):
+    texto = _oferta_json_ld(html)
+    if len(texto) >= MIN_CARACTERES_OFERTA:
+        return texto
+
+    BeautifulSoup, parser = _sopa()
+    soup = BeautifulSoup(html, parser)
+    # Antes de elegir la raíz: un "cookie-description" no debe ganarle a la oferta
+    avisos = soup.select(AVISOS)
+    if avisos:
+        tope = min(MAX_CARACTERES_AVISO, len(soup.get_text(strip=True)) // 2)
+        for nodo in avisos:
+            if not nodo.decomposed and len(nodo.get_text(strip=True)) <= tope: nodo.decompose()
+    raiz = soup.body or soup
+    for selector in SELECTORES_OFERTA:
+        nodo = soup.select_one(selector)
+        if nodo and len(nodo.get_text(strip=True)) >= MIN_CARACTERES_OFERTA:
+            raiz = nodo
+            break
+    # Solo se limpia el subárbol elegido, no el DOM completo
+    for t in raiz(RUIDO): t.decompose()
+    # Un salto por bloque conserva los encabezados para la compactación
+    lineas = raiz.get_text(separator='\n', strip=True).splitlines()
+    return "\n".join(l for l in lineas if not _RE_LINEA_AVISO.fullmatch(l))
+
+
+def leer_web(url):
+    ahora = time.time()
+    with _cache_lock:
+        entrada = _cache.get(url)
+        if entrada:
+            _cache.move_to_end(url)
+            if ahora - entrada['ts'] < FRESCURA_SEGUNDOS:
+                metricas.cache("web", True)
+                return entrada['texto']
+    metricas.cache("web", False)
+
+    cabeceras = {}
+    if entrada:
+        if entrada['etag']: cabeceras['If-None-Match'] = entrada['etag']
+        if entrada['last_modified']: cabeceras['If-Modified-Since'] = entrada['last_modified']
+
+    try:
+        with metricas.tramo("leer_web") as traza:
+            r, html = _descargar(url, cabeceras)
+            traza['estado'] = r.status_code
+            if html is None:  # 304: sigue valiendo lo que teníamos
+                texto = entrada['texto']
+            else:
+                texto = extraer_oferta(html)
+    except:
+        return entrada['texto'] if entrada else ""
+
+    with _cache_lock:
+        _cache[url] = {
+            'texto': texto,
+            'etag': r.headers.get('ETag') or (entrada or {}).get('etag'),
+            'last_modified': r.headers.get('Last-Modified') or (entrada or {}).get('last_modified'),
+            'ts': ahora,
+        }
+        _cache.move_to_end(url)
+        while len(_cache) > MAX_CACHE: _cache.popitem(last=False)
+    return texto